@@ -1,12 +1,19 @@
-import mlflow 
 import uvicorn
 import json
+import os
+import asyncio
 import pandas as pd 
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
 from typing import Literal, List, Union
-from fastapi import FastAPI, File, UploadFile
-import boto3
-import pickle
+from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi.responses import PlainTextResponse
+import pyarrow.parquet as pq
+
+from model_registry import ModelRegistry
+from batching import MicroBatcher
+from prediction_cache import PredictionCache
+from instrumentation import Timer, TimingMiddleware, render_metrics
 
 
 description = """
@@ -15,7 +22,64 @@ description = """
 
 """
 
-mlflow.set_tracking_uri("https://mlflow-getaround.herokuapp.com/")
+# The model is loaded once at startup and kept in memory.
+# MODEL_SOURCE=auto (default) serves the model artifact at MODEL_PATH when there is one,
+# otherwise the MLflow registry at MLFLOW_TRACKING_URI, as the deployed image always did.
+# MODEL_SOURCE=local requires MODEL_PATH: a directory saved by MLflow, a joblib file
+# (memory-mapped) or a compiled JSON artifact. MODEL_SOURCE=registry ignores MODEL_PATH.
+# In registry mode MODEL_URI pins a specific model, otherwise the latest version registered as MODEL_NAME is served
+# (car_price_estimator_LR, the plain linear regression; the searches of train.py register their own names).
+# A new version is picked up every MODEL_REFRESH_INTERVAL seconds (0 disables it).
+# COMPILED_MODEL=1 serves the pipeline flattened to NumPy arithmetic (see compiled_model.py)
+MODEL_SOURCE = os.environ.get("MODEL_SOURCE", "auto")
+MODEL_PATH = os.environ.get("MODEL_PATH", "model")
+if MODEL_SOURCE == "auto":
+    MODEL_SOURCE = "local" if os.path.exists(MODEL_PATH) else "registry"
+
+registry = ModelRegistry(
+    model_name=os.environ.get("MODEL_NAME", "car_price_estimator_LR"),
+    model_uri=os.environ.get("MODEL_URI"),
+    model_path=MODEL_PATH if MODEL_SOURCE == "local" else None,
+    tracking_uri=os.environ.get("MLFLOW_TRACKING_URI", "https://mlflow-getaround.herokuapp.com/"),
+    compiled=os.environ.get("COMPILED_MODEL", "0") == "1"
+)
+MODEL_REFRESH_INTERVAL = float(os.environ.get("MODEL_REFRESH_INTERVAL", 60))
+
+# TIMING_ENABLED=1 times each stage of the predictions: histograms are exposed on /metrics
+# and every response gets a Server-Timing header
+timer = Timer(enabled=os.environ.get("TIMING_ENABLED", "0") == "1")
+
+def run_model(model, car_prices):
+    '''
+    Predicts a DataFrame of cars, timing the preprocessing and the regression separately
+    '''
+    if timer.enabled and hasattr(model, "steps"):
+        with timer.span("preprocessing"):
+            features = model[:-1].transform(car_prices)
+        with timer.span("regression"):
+            return model[-1].predict(features)
+    with timer.span("prediction"):
+        return model.predict(car_prices)
+
+# Number of rows read and predicted at once for uploaded files
+BATCH_CHUNK_SIZE = int(os.environ.get("BATCH_CHUNK_SIZE", 10000))
+
+# Concurrent calls to /predict are grouped for up to BATCH_WINDOW_MS milliseconds
+# or BATCH_MAX_SIZE cars and predicted together (BATCH_MAX_SIZE=1 disables it)
+batcher = MicroBatcher(
+    lambda car_prices: run_model(registry.get()[1], car_prices),
+    window_ms=float(os.environ.get("BATCH_WINDOW_MS", 2)),
+    max_batch_size=int(os.environ.get("BATCH_MAX_SIZE", 64)),
+    timer=timer
+)
+
+# Predictions of /predict are cached for CACHE_TTL seconds, keeping at most
+# CACHE_MAX_SIZE cars (0 disables it). Swapping the model clears the cache
+cache = PredictionCache(
+    max_size=int(os.environ.get("CACHE_MAX_SIZE", 10000)),
+    ttl=float(os.environ.get("CACHE_TTL", 300))
+)
+registry.add_listener(cache.clear)
 
 
 tag_metadata = [
@@ -25,6 +89,19 @@ tag_metadata = [
     }
 ]
 
+@asynccontextmanager
+async def lifespan(app):
+    registry.load()
+    watcher = None
+    if MODEL_REFRESH_INTERVAL > 0:
+        watcher = asyncio.ensure_future(registry.watch(MODEL_REFRESH_INTERVAL))
+    if batcher.enabled:
+        batcher.start()
+    yield
+    await batcher.stop()
+    if watcher is not None:
+        watcher.cancel()
+
 app = FastAPI(
     title="My GetAround API",
     description=description,
@@ -33,9 +110,13 @@ app = FastAPI(
         "name": "GetAround",
         "url": "https://mlflow-getaround.herokuapp.com/",
     },
-    openapi_tags=tag_metadata
+    openapi_tags=tag_metadata,
+    lifespan=lifespan
 )
 
+if timer.enabled:
+    app.add_middleware(TimingMiddleware)
+
 class PredictionFeatures(BaseModel):
     model_key: str = "Citroën"
     mileage: int = 140411
@@ -51,6 +132,8 @@ class PredictionFeatures(BaseModel):
     has_speed_regulator: bool = True
     winter_tires: bool = True
 
+FEATURES = list(PredictionFeatures.__annotations__)
+
 
 @app.get("/")
 async def index():
@@ -64,18 +147,136 @@ async def predict(predictionFeatures: PredictionFeatures):
     """
     Prediction of rental price per day for a car
     """
-    # Read data 
-    car_price = pd.DataFrame(dict(predictionFeatures), index=[0])
-    # # Log model from mlflow 
-    logged_model = 'runs:/f7d5061de4e74c6fa52c91d76f522bfa/car_price_estimator'
+    # Body parsing and pydantic validation happen before the handler is called
+    timer.since_request_start("validation")
+
+    # The same car configuration is often requested again. The model predicts the
+    # canonical features used for the cache key, so a hit never accepts what a miss would reject
+    features = PredictionCache.canonicalize(dict(predictionFeatures))
+    if cache.enabled:
+        with timer.span("cache"):
+            key = cache.make_key(registry.version, features)
+            prediction = cache.get(key)
+        if prediction is not None:
+            return {"prediction": prediction}
+
+    try:
+        # Concurrent requests are predicted together by the batcher
+        if batcher.enabled:
+            with timer.span("batch"):
+                prediction = await batcher.submit(features)
+        else:
+            # Read data 
+            with timer.span("dataframe"):
+                car_price = pd.DataFrame(features, index=[0])
+
+            # Use the model kept in memory by the registry
+            with timer.span("model"):
+                version, loaded_model = registry.get()
+            prediction = run_model(loaded_model, car_price).tolist()[0]
+    except ValueError as e:
+        # The model rejects the car, e.g. a model_key or a fuel it was not trained on
+        raise HTTPException(status_code=422, detail=f"Could not predict this car: {e}")
 
-    # Load model as a PyFuncModel.
-    loaded_model = mlflow.pyfunc.load_model(logged_model)
-    prediction = loaded_model.predict(car_price)
+    if cache.enabled:
+        cache.put(key, prediction)
 
     # Format response
-    response = {"prediction": prediction.tolist()[0]}
+    response = {"prediction": prediction}
+    return response
+
+@app.post("/predict/batch", tags=["Machine Learning"])
+async def predict_batch(predictionFeatures: List[PredictionFeatures]):
+    """
+    Prediction of rental price per day for a list of cars, in a single call to the model
+    """
+    timer.since_request_start("validation")
+
+    # Build one columnar DataFrame for all the cars
+    with timer.span("dataframe"):
+        cars = [PredictionCache.canonicalize(dict(car)) for car in predictionFeatures]
+        car_prices = pd.DataFrame({feature: [car[feature] for car in cars] for feature in FEATURES})
+
+    version, loaded_model = registry.get()
+    try:
+        prediction = run_model(loaded_model, car_prices).tolist() if len(car_prices) else []
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Could not predict these cars: {e}")
+
+    response = {"prediction": prediction}
     return response
 
+def read_chunks(file):
+    '''
+    Reads an uploaded CSV or Parquet file by chunks of BATCH_CHUNK_SIZE rows
+    '''
+    if file.filename.endswith(".parquet"):
+        parquet_file = pq.ParquetFile(file.file)
+        for batch in parquet_file.iter_batches(batch_size=BATCH_CHUNK_SIZE, columns=FEATURES):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(file.file, chunksize=BATCH_CHUNK_SIZE):
+            yield chunk
+
+@app.post("/predict/batch/file", tags=["Machine Learning"])
+def predict_batch_file(file: UploadFile = File(...)):
+    """
+    Prediction of rental price per day for every car of a CSV or Parquet file
+    """
+    version, loaded_model = registry.get()
+    prediction = []
+    try:
+        for chunk in read_chunks(file):
+            # Keep only the features, extra columns like an index or the target are ignored
+            prediction.extend(run_model(loaded_model, chunk[FEATURES]).tolist())
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Could not read the uploaded file: {e}")
+
+    response = {"prediction": prediction}
+    return response
+
+@app.get("/stats")
+async def stats():
+    """
+    Serving metrics, used to size the batching window and the prediction cache
+    """
+    return {"batching": batcher.stats(), "cache": cache.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Serving metrics in the Prometheus text format
+    """
+    batching, caching = batcher.stats(), cache.stats()
+    values = {
+        "getaround_batch_queue_depth": batching["queue_depth"],
+        "getaround_batches_total": batching["batches"],
+        "getaround_batched_rows_total": batching["rows"],
+        "getaround_batch_size_last": batching["last_batch_size"],
+        "getaround_batch_size_max": batching["max_batch_size_seen"],
+        "getaround_cache_size": caching["size"],
+        "getaround_cache_hits_total": caching["hits"],
+        "getaround_cache_misses_total": caching["misses"],
+        "getaround_cache_evictions_total": caching["evictions"],
+        "getaround_cache_expirations_total": caching["expirations"],
+    }
+    return render_metrics(values)
+
+@app.get("/model", tags=["Machine Learning"])
+async def model_info():
+    """
+    Version of the model currently served
+    """
+    return {"name": registry.model_name, "version": registry.version}
+
+@app.post("/model/reload", tags=["Machine Learning"])
+async def model_reload():
+    """
+    Loads the latest registered version of the model without restarting the server
+    """
+    loop = asyncio.get_event_loop()
+    reloaded = await loop.run_in_executor(None, registry.refresh)
+    return {"name": registry.model_name, "version": registry.version, "reloaded": reloaded}
+
 if __name__=="__main__":
     uvicorn.run(app, host="0.0.0.0", port=4000, debug=True, reload=True) # Here you define your web server to run the `app` variable (which contains FastAPI instance), with a specific host IP (0.0.0.0) and port (4000)
\ No newline at end of file
@@ -0,0 +1,156 @@
+import asyncio
+
+import pandas as pd
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-car predictions into one vectorized model call.
+
+    Requests are queued and collected for up to `window_ms` milliseconds or
+    `max_batch_size` rows, whichever comes first. The stacked DataFrame is
+    predicted once and each waiting request receives its own row of the result.
+
+    The model runs outside the requests, so with a `timer` the stages it times
+    are added to the spans of every request of the batch.
+    """
+
+    def __init__(self, predict, window_ms=2, max_batch_size=64, timer=None):
+        # `predict` takes a DataFrame and returns one prediction per row
+        self.predict = predict
+        self.timer = timer
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue = None
+        self._worker = None
+
+        # Metrics
+        self.batches = 0
+        self.rows = 0
+        self.last_batch_size = 0
+        self.max_seen_batch_size = 0
+
+    @property
+    def enabled(self):
+        return self.max_batch_size > 1
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        '''
+        Starts the worker task, must be called from the running event loop
+        '''
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, row):
+        '''
+        Queues one row (a dict of features) and waits for its prediction
+        '''
+        future = asyncio.get_event_loop().create_future()
+        spans = self.timer.request_spans() if self.timer is not None else None
+        await self._queue.put((row, future, spans))
+        return await future
+
+    async def _collect(self):
+        '''
+        Waits for a first request then gathers others until the window closes or the batch is full
+        '''
+        loop = asyncio.get_event_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            rows = [row for row, future, spans in batch]
+            frame = pd.DataFrame({feature: [row[feature] for row in rows] for feature in rows[0]})
+
+            self.batches += 1
+            self.rows += len(batch)
+            self.last_batch_size = len(batch)
+            self.max_seen_batch_size = max(self.max_seen_batch_size, len(batch))
+
+            try:
+                predictions = list(await self._call(batch, frame))
+            except Exception as e:
+                if len(batch) == 1:
+                    self._fail(batch, e)
+                else:
+                    # One invalid row (e.g. an unknown category) must not fail the other requests
+                    await self._predict_one_by_one(batch, frame)
+                continue
+
+            for (row, future, spans), prediction in zip(batch, predictions):
+                # The client may have gone away while waiting
+                if not future.done():
+                    future.set_result(float(prediction))
+
+    async def _call(self, batch, frame):
+        '''
+        Predicts a frame in a thread, so new requests keep being queued, and adds its spans to the requests of `batch`
+        '''
+        loop = asyncio.get_event_loop()
+        if self.timer is None:
+            return await loop.run_in_executor(None, self.predict, frame)
+        predictions, batch_spans = await loop.run_in_executor(None, self.timer.collect, self.predict, frame)
+        for row, future, spans in batch:
+            if spans is not None:
+                spans.extend(batch_spans)
+        return predictions
+
+    async def _predict_one_by_one(self, batch, frame):
+        '''
+        Predicts each row of a failed batch on its own, so only the invalid requests get the error
+        '''
+        for i, item in enumerate(batch):
+            row, future, spans = item
+            try:
+                prediction = await self._call([item], frame.iloc[[i]].reset_index(drop=True))
+                prediction = float(list(prediction)[0])
+            except Exception as e:
+                self._fail([item], e)
+                continue
+            if not future.done():
+                future.set_result(prediction)
+
+    @staticmethod
+    def _fail(batch, error):
+        for row, future, spans in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "batches": self.batches,
+            "rows": self.rows,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size_seen": self.max_seen_batch_size,
+            "average_batch_size": self.rows / self.batches if self.batches else 0,
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+        }
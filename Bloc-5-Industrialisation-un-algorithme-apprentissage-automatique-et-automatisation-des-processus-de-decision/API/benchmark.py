@@ -0,0 +1,217 @@
+"""
+Load test and latency benchmark of the GetAround API.
+
+Runs offline against a locally trained model, for example:
+
+    python ../Machine_Learning/train.py --save-local model.joblib   (from Machine_Learning/)
+    python benchmark.py --model-path model.joblib --mode both --concurrency 1 16 64 --workers 1 2 4
+
+Measures requests per second and p50/p95/p99 latencies for several payload mixes,
+concurrency levels and (over a local uvicorn socket) worker counts, then writes
+the results as JSON so they can be diffed between commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+import pandas as pd
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA = os.path.join(HERE, "..", "Machine_Learning", "get_around_pricing_project.csv")
+MIXES = ["default", "repeated", "random", "batch"]
+
+
+def load_cars(path):
+    '''
+    Returns the cars of the pricing dataset as a list of JSON payloads
+    '''
+    data = pd.read_csv(path).iloc[:, 1:].drop(columns=["rental_price_per_day"])
+    return json.loads(data.to_json(orient="records"))
+
+
+def make_payloads(mix, cars, n, batch_size, seed=42):
+    '''
+    Returns n (endpoint, payload) pairs for a payload mix
+    '''
+    rng = random.Random(seed)
+    if mix == "default":
+        # Always the same car, mostly served by the prediction cache
+        return [("/predict", {})] * n
+    if mix == "repeated":
+        # A small pool of configurations, like users toggling options
+        pool = rng.sample(cars, 20)
+        return [("/predict", rng.choice(pool)) for _ in range(n)]
+    if mix == "random":
+        return [("/predict", rng.choice(cars)) for _ in range(n)]
+    if mix == "batch":
+        return [("/predict/batch", rng.sample(cars, batch_size)) for _ in range(n)]
+    raise ValueError(f"Unknown payload mix '{mix}'")
+
+
+async def run_load(client, payloads, concurrency):
+    '''
+    Sends the payloads with `concurrency` concurrent clients and returns the measures
+    '''
+    latencies = []
+    errors = 0
+    queue = list(reversed(payloads))
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            endpoint, payload = queue.pop()
+            start = time.perf_counter()
+            response = await client.post(endpoint, json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+
+
+async def run_scenarios(client, args, cars, **labels):
+    results = []
+    for mix in args.mixes:
+        for concurrency in args.concurrency:
+            payloads = make_payloads(mix, cars, args.requests, args.batch_size)
+            # Warm up (model, caches, connections) before measuring
+            await run_load(client, payloads[:args.warmup], concurrency)
+            measures = await run_load(client, payloads, concurrency)
+            result = dict(labels, mix=mix, concurrency=concurrency, **measures)
+            print(json.dumps(result))
+            results.append(result)
+    return results
+
+
+async def benchmark_in_process(args, cars):
+    '''
+    Drives the FastAPI app in the same process, without any network
+    '''
+    sys.path.insert(0, HERE)
+    import app
+
+    async with app.app.router.lifespan_context(app.app):
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            return await run_scenarios(client, args, cars, mode="in-process", workers=1)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_until_ready(client, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The API server exited before being ready")
+        try:
+            if (await client.get("/model")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("The API server did not start in time")
+
+
+async def benchmark_socket(args, cars, workers):
+    '''
+    Starts uvicorn with `workers` processes on a local port and drives it over HTTP
+    '''
+    port = free_port()
+    command = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning"]
+    process = subprocess.Popen(command, cwd=HERE, env=os.environ.copy())
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            await wait_until_ready(client, process)
+            return await run_scenarios(client, args, cars, mode="socket", workers=workers)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the GetAround API")
+    parser.add_argument("--model-path", default=os.environ.get("MODEL_PATH", "model"), help="Locally trained model served during the benchmark")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="CSV of cars used to build the payloads")
+    parser.add_argument("--mode", choices=["in-process", "socket", "both"], default="in-process")
+    parser.add_argument("--mixes", nargs="+", choices=MIXES, default=MIXES)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 16, 64])
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4], help="Worker counts for the socket mode")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=100, help="Requests sent before each scenario")
+    parser.add_argument("--batch-size", type=int, default=100, help="Cars per request for the batch mix")
+    parser.add_argument("--output", help="JSON file of the results (default: benchmarks/<commit>.json)")
+    args = parser.parse_args()
+
+    # The server never reaches the tracking server during a benchmark
+    os.environ["MODEL_SOURCE"] = "local"
+    os.environ["MODEL_PATH"] = os.path.abspath(args.model_path)
+    if not os.path.exists(os.environ["MODEL_PATH"]):
+        sys.exit(f"No model found at {args.model_path}, train one with `python train.py --save-local <path>`")
+
+    cars = load_cars(args.data)
+    results = []
+    if args.mode in ("in-process", "both"):
+        results += asyncio.run(benchmark_in_process(args, cars))
+    if args.mode in ("socket", "both"):
+        for workers in args.workers:
+            results += asyncio.run(benchmark_socket(args, cars, workers))
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "model_path": args.model_path,
+            "requests": args.requests,
+            "batch_size": args.batch_size,
+            "env": {name: os.environ[name] for name in sorted(os.environ)
+                    if name.startswith(("BATCH_", "CACHE_", "COMPILED_"))},
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(HERE, "benchmarks", f"{commit or 'results'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
@@ -0,0 +1,168 @@
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+
+def compile_pipeline(pipeline):
+    '''
+    Flattens a fitted pricing pipeline into a plain dict artifact.
+
+    Supports the pipeline built in Machine_Learning/train.py: a ColumnTransformer
+    made of a StandardScaler on numeric features and a OneHotEncoder on
+    categorical features, followed by a linear regressor.
+    '''
+    preprocessor = pipeline.steps[0][1]
+    regressor = pipeline.steps[-1][1]
+    coef = np.asarray(regressor.coef_, dtype=float).ravel()
+
+    numeric, categorical = [], []
+    offset = 0
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == 'drop' or name == 'remainder':
+            continue
+        step = transformer.steps[-1][1] if hasattr(transformer, 'steps') else transformer
+
+        if hasattr(step, 'categories_'):
+            for i, column in enumerate(columns):
+                categories = step.categories_[i].tolist()
+                dropped = step.drop_idx_[i] if step.drop_idx_ is not None else None
+                coefs = []
+                for j in range(len(categories)):
+                    if j == dropped:
+                        # The dropped category has no column, it adds nothing to the prediction
+                        coefs.append(0.0)
+                    else:
+                        coefs.append(float(coef[offset]))
+                        offset += 1
+                categorical.append({"name": column, "categories": categories, "coefs": coefs})
+        else:
+            means = step.mean_ if step.with_mean else np.zeros(len(columns))
+            scales = step.scale_ if step.with_std else np.ones(len(columns))
+            for i, column in enumerate(columns):
+                numeric.append({
+                    "name": column,
+                    "mean": float(means[i]),
+                    "scale": float(scales[i]),
+                    "coef": float(coef[offset])
+                })
+                offset += 1
+
+    if offset != len(coef):
+        raise ValueError(f"Pipeline produces {len(coef)} features but {offset} were compiled")
+
+    return {
+        "numeric": numeric,
+        "categorical": categorical,
+        "intercept": float(np.ravel(regressor.intercept_)[0])
+    }
+
+
+class CompiledLinearModel:
+    """
+    Scores cars from a compiled artifact with dict lookups and NumPy arithmetic.
+
+    Contributions are accumulated feature by feature in the order of the
+    pipeline's design matrix, which is also the order used by the sparse
+    matrix product of the regressor, so predictions are bit-identical to
+    a sparse sklearn pipeline. A dense pipeline (the LinearRegression of
+    train.py) sums with BLAS in another order and differs by about 1e-14.
+    """
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.numeric = [(f["name"], f["mean"], f["scale"], f["coef"]) for f in artifact["numeric"]]
+        self.categorical = [(f["name"], dict(zip(f["categories"], f["coefs"]))) for f in artifact["categorical"]]
+        self.intercept = artifact["intercept"]
+
+    @classmethod
+    def from_pipeline(cls, pipeline, check=True):
+        '''
+        Compiles a fitted pipeline, checking it against the pipeline on a probe frame
+        '''
+        compiled = cls(compile_pipeline(pipeline))
+        if check:
+            check_equivalence(pipeline, compiled, compiled.probe_frame())
+        return compiled
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def to_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.artifact, f, ensure_ascii=False)
+
+    def predict(self, data):
+        '''
+        Returns the predicted rental price per day for each row of a DataFrame
+        '''
+        total = np.zeros(len(data))
+
+        for name, mean, scale, coef in self.numeric:
+            total += (data[name].to_numpy(dtype=float) - mean) / scale * coef
+
+        for name, lookup in self.categorical:
+            try:
+                total += np.fromiter((lookup[value] for value in data[name]), dtype=float, count=len(data))
+            except KeyError as e:
+                raise ValueError(f"Found unknown category {e} in column '{name}'")
+
+        return total + self.intercept
+
+    def probe_frame(self):
+        '''
+        Returns a frame where every known category and a spread of numeric values appear
+        '''
+        n = max([len(f["categories"]) for f in self.artifact["categorical"]] + [2])
+        spread = np.linspace(-2, 2, n)
+        probe = {}
+        for f in self.artifact["numeric"]:
+            probe[f["name"]] = np.round(f["mean"] + spread * f["scale"])
+        for f in self.artifact["categorical"]:
+            probe[f["name"]] = [f["categories"][i % len(f["categories"])] for i in range(n)]
+        return pd.DataFrame(probe)
+
+
+# Largest difference accepted when the predictions are not bit-identical (dense pipelines)
+TOLERANCE = 1e-9
+
+
+def check_equivalence(pipeline, compiled, data):
+    '''
+    Raises a ValueError unless the compiled model gives the pipeline predictions.
+    They are bit-identical for a sparse pipeline; a difference up to TOLERANCE
+    (floating point summation order of a dense pipeline) is only reported
+    '''
+    expected = np.asarray(pipeline.predict(data), dtype=float).ravel()
+    actual = compiled.predict(data)
+    if np.array_equal(expected, actual):
+        return
+    difference = np.abs(expected - actual).max()
+    if difference > TOLERANCE:
+        raise ValueError(f"Compiled model differs from the pipeline (max absolute difference {difference})")
+    print(f"Warning: compiled model is not bit-identical to the pipeline (max absolute difference {difference})")
+
+
+if __name__ == "__main__":
+    import mlflow.sklearn
+
+    parser = argparse.ArgumentParser(description="Export a fitted pricing pipeline as a compiled artifact")
+    parser.add_argument("model_uri", help="MLflow URI or local path of the sklearn model")
+    parser.add_argument("output", help="Path of the JSON artifact to write")
+    parser.add_argument("--data", help="CSV of cars used to check the compiled model against the pipeline")
+    args = parser.parse_args()
+
+    pipeline = mlflow.sklearn.load_model(args.model_uri)
+    compiled = CompiledLinearModel.from_pipeline(pipeline)
+
+    if args.data:
+        data = pd.read_csv(args.data)
+        features = [f["name"] for f in compiled.artifact["numeric"] + compiled.artifact["categorical"]]
+        check_equivalence(pipeline, compiled, data[features])
+        print(f"Compiled model matches the pipeline on {len(data)} rows of {args.data}")
+
+    compiled.to_json(args.output)
+    print(f"Compiled model written to {args.output}")
@@ -0,0 +1,174 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import Match
+
+
+# Upper bounds (in seconds) of the histogram buckets
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Stages timed during the current request, and when the request started
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+_request_start = contextvars.ContextVar("request_start", default=None)
+
+
+def escape_label(value):
+    '''
+    Escapes a label value for the Prometheus text format
+    '''
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """
+    Prometheus histogram with a single label
+    """
+
+    def __init__(self, name, documentation, label, buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        '''
+        Returns the histogram in the Prometheus text format
+        '''
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, series in sorted(self._series.items()):
+                label = f'{self.label}="{escape_label(label_value)}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{label}}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{{label}}} {series["count"]}')
+        return lines
+
+
+stage_duration = Histogram("getaround_stage_duration_seconds", "Time spent in each stage of a prediction", "stage")
+request_duration = Histogram("getaround_request_duration_seconds", "Time spent handling a request", "path")
+
+
+class Timer:
+    """
+    Opt-in timing of the prediction stages.
+
+    When enabled, `span` records each stage in a histogram and in the spans of
+    the current request, which the middleware sends back as a Server-Timing header.
+    When disabled, spans cost nothing.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+
+    @contextmanager
+    def span(self, stage):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage, seconds):
+        stage_duration.observe(stage, seconds)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, seconds))
+
+    def request_spans(self):
+        '''
+        Returns the spans of the current request, None when timing is disabled or outside a request
+        '''
+        return _request_spans.get() if self.enabled else None
+
+    def collect(self, function, *args):
+        '''
+        Calls `function` with its spans kept apart from the current request, returns its result and the spans.
+        Used for the work shared by many requests, e.g. a batch predicted in another thread
+        '''
+        spans = []
+        token = _request_spans.set(spans)
+        try:
+            return function(*args), spans
+        finally:
+            _request_spans.reset(token)
+
+    def since_request_start(self, stage):
+        '''
+        Records the time elapsed since the request reached the middleware
+        '''
+        start = _request_start.get()
+        if self.enabled and start is not None:
+            self.record(stage, time.perf_counter() - start)
+
+
+def route_template(request):
+    '''
+    Returns the path template of the route that handled a request, "unmatched" for unknown paths.
+    The request metrics are labelled with it: every path of the scanners would add its own series
+    '''
+    # Set by the FastAPI routes, the plain Starlette ones (e.g. /docs) are matched again
+    route = request.scope.get("route")
+    if route is None:
+        for candidate in request.app.router.routes:
+            if candidate.matches(request.scope)[0] == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", "unmatched")
+
+
+class TimingMiddleware(BaseHTTPMiddleware):
+    """
+    Times every request and adds a Server-Timing header with its stages
+    """
+
+    async def dispatch(self, request, call_next):
+        spans = []
+        _request_spans.set(spans)
+        start = time.perf_counter()
+        _request_start.set(start)
+
+        response = await call_next(request)
+
+        total = time.perf_counter() - start
+        request_duration.observe(route_template(request), total)
+        timings = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in spans]
+        timings.append(f"total;dur={total * 1000:.3f}")
+        response.headers["Server-Timing"] = ", ".join(timings)
+        return response
+
+
+def render_metrics(values):
+    '''
+    Returns all metrics in the Prometheus text format, `values` maps metric names to values
+    '''
+    lines = stage_duration.render() + request_duration.render()
+    for name, value in values.items():
+        # By convention counters end with _total
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
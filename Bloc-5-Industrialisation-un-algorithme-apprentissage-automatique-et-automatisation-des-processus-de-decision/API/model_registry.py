@@ -0,0 +1,157 @@
+import asyncio
+import os
+import threading
+
+import joblib
+
+from compiled_model import CompiledLinearModel
+
+
+MODEL_NAME = "car_price_estimator_LR"
+TRACKING_URI = "https://mlflow-getaround.herokuapp.com/"
+
+
+def load_local_model(path):
+    '''
+    Loads a model stored on disk.
+
+    The path can be a compiled JSON artifact, a joblib/pickle file (its arrays are
+    memory-mapped) or a directory saved with mlflow.sklearn.save_model
+    '''
+    if path.endswith(".json"):
+        return CompiledLinearModel.from_json(path)
+    if os.path.isdir(path):
+        # MLflow is slow to import, it is only needed for this format
+        import mlflow.sklearn
+        return mlflow.sklearn.load_model(path)
+    return joblib.load(path, mmap_mode="r")
+
+
+class ModelRegistry:
+    """
+    Keeps the pricing model loaded in memory and shares it across requests.
+
+    The model is loaded once (at application startup) and can then be replaced
+    by a newer version without restarting the server. The swap is atomic: a
+    request always sees a consistent (version, model) pair.
+
+    The model comes either from a local path, whose version is its modification
+    time (in nanoseconds) and size, or from the MLflow model registry on the
+    tracking server.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, model_uri=None, model_path=None, tracking_uri=TRACKING_URI, compiled=False):
+        # If a model URI is given the registry is pinned to it and never refreshed
+        self.model_name = model_name
+        self.model_uri = model_uri
+        self.model_path = model_path
+        self.tracking_uri = tracking_uri
+        # Serve the NumPy compiled version of the sklearn pipeline
+        self.compiled = compiled
+        self._current = (None, None)
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    @property
+    def source(self):
+        return "local" if self.model_path is not None else "registry"
+
+    def get(self):
+        '''
+        Returns the current (version, model) pair
+        '''
+        version, model = self._current
+        if model is None:
+            raise RuntimeError("The pricing model has not been loaded yet")
+        return version, model
+
+    def add_listener(self, listener):
+        '''
+        Registers a callback called with the new version after each swap
+        '''
+        self._listeners.append(listener)
+
+    def _mlflow(self):
+        import mlflow
+        import mlflow.sklearn
+        mlflow.set_tracking_uri(self.tracking_uri)
+        return mlflow
+
+    def latest_version(self):
+        '''
+        Returns the latest version of the model, None if there is none
+        '''
+        if self.model_path is not None:
+            if not os.path.exists(self.model_path):
+                return None
+            # Nanoseconds and size, an artifact replaced twice within a second is still a new version
+            stat = os.stat(self.model_path)
+            return f"local-{stat.st_mtime_ns}-{stat.st_size}"
+
+        client = self._mlflow().tracking.MlflowClient()
+        versions = client.search_model_versions(f"name='{self.model_name}'")
+        if not versions:
+            return None
+        return str(max(int(v.version) for v in versions))
+
+    def load(self, version=None):
+        '''
+        Loads a version of the model (the latest one by default) and swaps it in
+        '''
+        if self.model_path is None and self.model_uri is not None:
+            version = self.model_uri
+        else:
+            version = version or self.latest_version()
+            if version is None:
+                raise RuntimeError(f"No model found for '{self.model_path or self.model_name}'")
+
+        # Loading happens outside of the lock so requests keep being served by the old model
+        if self.model_path is not None:
+            model = load_local_model(self.model_path)
+        else:
+            uri = self.model_uri or f"models:/{self.model_name}/{version}"
+            mlflow = self._mlflow()
+            model = mlflow.sklearn.load_model(uri) if self.compiled else mlflow.pyfunc.load_model(uri)
+
+        if self.compiled and not isinstance(model, CompiledLinearModel):
+            model = CompiledLinearModel.from_pipeline(model)
+        self.swap(version, model)
+        return version
+
+    def swap(self, version, model):
+        '''
+        Atomically replaces the served model
+        '''
+        with self._lock:
+            self._current = (version, model)
+        print(f"Serving model '{self.model_name}' version {version} ({self.source})")
+        for listener in self._listeners:
+            listener(version)
+
+    def refresh(self):
+        '''
+        Loads the latest version if it differs from the served one
+        '''
+        if self.model_path is None and self.model_uri is not None:
+            return False
+        latest = self.latest_version()
+        if latest is None or latest == self.version:
+            return False
+        self.load(latest)
+        return True
+
+    async def watch(self, interval):
+        '''
+        Checks for a new version every `interval` seconds and hot-swaps it
+        '''
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.refresh)
+            except Exception as e:
+                print(f"Could not refresh the pricing model: {e}")
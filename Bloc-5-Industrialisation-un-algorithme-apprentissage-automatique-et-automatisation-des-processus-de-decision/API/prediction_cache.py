@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    In-process LRU cache of predictions with a time to live.
+
+    Keys combine the model version with the canonicalized car features, so a
+    prediction is never served for another model. The cache is also cleared
+    whenever the model is swapped.
+    """
+
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    @staticmethod
+    def canonicalize(features):
+        '''
+        Returns the features with surrounding spaces stripped and whole floats as ints.
+        The API predicts these canonical features, so a cache hit and a miss always agree
+        '''
+        canonical = {}
+        for name, value in features.items():
+            if isinstance(value, str):
+                value = value.strip()
+            elif isinstance(value, float) and value.is_integer():
+                value = int(value)
+            canonical[name] = value
+        return canonical
+
+    @staticmethod
+    def make_key(version, features):
+        '''
+        Returns the cache key of a dict of canonical features for a model version
+        '''
+        return (version, tuple(sorted(features.items())))
+
+    def get(self, key):
+        '''
+        Returns the cached prediction for a key, None if missing or expired
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, *args):
+        '''
+        Drops every entry, used as a model swap listener
+        '''
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0,
+        }
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from compiled_model import CompiledLinearModel, check_equivalence
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "Machine_Learning"))
+from train import build_pipeline
+
+
+@pytest.fixture(scope="module")
+def cars():
+    data = pd.read_csv(os.path.join(HERE, "..", "Machine_Learning", "get_around_pricing_project.csv")).iloc[:, 1:]
+    return data.drop(columns=["rental_price_per_day"]), data["rental_price_per_day"]
+
+
+def test_compiled_model_is_bit_identical_to_the_sparse_pipeline(cars):
+    X, y = cars
+    pipeline = build_pipeline(LinearRegression(), sparse=True).fit(X, y)
+    compiled = CompiledLinearModel.from_pipeline(pipeline)
+
+    assert np.array_equal(pipeline.predict(X), compiled.predict(X))
+
+
+def test_compiled_model_matches_the_dense_pipeline(cars):
+    X, y = cars
+    pipeline = build_pipeline(LinearRegression()).fit(X, y)
+    compiled = CompiledLinearModel.from_pipeline(pipeline)
+
+    # Not bit-identical, BLAS sums the dense design matrix in another order
+    assert np.allclose(pipeline.predict(X), compiled.predict(X), rtol=0, atol=1e-9)
+
+
+def test_check_equivalence_rejects_a_different_model(cars):
+    X, y = cars
+    pipeline = build_pipeline(LinearRegression()).fit(X, y)
+    compiled = CompiledLinearModel.from_pipeline(pipeline)
+    compiled.intercept += 1
+
+    with pytest.raises(ValueError):
+        check_equivalence(pipeline, compiled, X)
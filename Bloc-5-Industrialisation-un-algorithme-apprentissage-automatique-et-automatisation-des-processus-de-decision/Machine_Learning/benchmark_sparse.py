@@ -0,0 +1,94 @@
+"""
+Memory and time benchmark of the sparse and dense pricing pipelines.
+
+The pricing dataset is upsampled (10x and 100x by default) with a small jitter on
+the numeric features, then both pipelines are fitted and used for predictions:
+
+    python benchmark_sparse.py --factors 1 10 100 --output sparse_benchmark.json
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.linear_model import LinearRegression
+
+from train import build_pipeline
+
+
+def upsample(data, factor, seed=42):
+    '''
+    Returns `factor` copies of the dataset, with jittered mileage and engine power
+    '''
+    rng = np.random.default_rng(seed)
+    upsampled = pd.concat([data] * factor, ignore_index=True)
+    upsampled["mileage"] = np.maximum(upsampled["mileage"] + rng.integers(-5000, 5000, len(upsampled)), 0)
+    upsampled["engine_power"] = np.maximum(upsampled["engine_power"] + rng.integers(-5, 5, len(upsampled)), 0)
+    return upsampled
+
+
+def matrix_bytes(matrix):
+    if sp.issparse(matrix):
+        matrix = matrix.tocsr()
+        return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    return matrix.nbytes
+
+
+def measure(X, y, sparse):
+    '''
+    Fits and predicts with the sparse or dense pipeline, returns times and memory used
+    '''
+    model = build_pipeline(LinearRegression(), sparse=sparse)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    model.fit(X, y)
+    fit_seconds = time.perf_counter() - start
+    _, fit_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    design = model[:-1].transform(X)
+    transform_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model.predict(X)
+    predict_seconds = time.perf_counter() - start
+
+    return {
+        "matrix": type(design).__name__,
+        "shape": list(design.shape),
+        "matrix_mb": round(matrix_bytes(design) / 1e6, 3),
+        "fit_peak_mb": round(fit_peak / 1e6, 3),
+        "fit_seconds": round(fit_seconds, 4),
+        "transform_seconds": round(transform_seconds, 4),
+        "predict_seconds": round(predict_seconds, 4),
+        "r2": round(model.score(X, y), 6),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="get_around_pricing_project.csv")
+    parser.add_argument("--factors", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data).iloc[:, 1:]
+
+    results = []
+    for factor in args.factors:
+        upsampled = upsample(data, factor)
+        X = upsampled.drop(['rental_price_per_day'], axis=1)
+        y = upsampled['rental_price_per_day']
+        for sparse in (True, False):
+            result = dict(factor=factor, rows=len(X), **measure(X, y, sparse))
+            print(json.dumps(result))
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from train import build_pipeline
+from train_streaming import features, fit_streaming, target
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA = os.path.join(HERE, "get_around_pricing_project.csv")
+
+
+@pytest.fixture(scope="module")
+def cars():
+    data = pd.read_csv(DATA).iloc[:, 1:]
+    return data[features], data[target]
+
+
+@pytest.fixture(scope="module")
+def streamed():
+    # Several chunks, so the normal equations are accumulated
+    return fit_streaming(DATA, chunksize=1000, solver="normal")
+
+
+def test_normal_equations_match_linear_regression_on_the_full_data(cars, streamed):
+    X, y = cars
+    pipeline = build_pipeline(LinearRegression()).fit(X, y)
+
+    assert np.allclose(streamed[-1].coef_, pipeline[-1].coef_, rtol=0, atol=1e-8)
+    assert streamed[-1].intercept_ == pytest.approx(pipeline[-1].intercept_, abs=1e-8)
+    assert np.allclose(streamed.predict(X), pipeline.predict(X), rtol=0, atol=1e-8)
+
+
+def test_a_file_without_rows_is_rejected(tmp_path):
+    path = tmp_path / "header_only.csv"
+    pd.read_csv(DATA, nrows=0).to_csv(path, index=False)
+
+    with pytest.raises(ValueError, match="No rows"):
+        fit_streaming(str(path), chunksize=1000)
@@ -1,3 +1,7 @@
+import argparse
+import shutil
+import tempfile
+import joblib
 import mlflow
 from mlflow.models.signature import infer_signature
 import pandas as pd
@@ -9,12 +13,109 @@ from sklearn.preprocessing import  OneHotEncoder, StandardScaler
 from sklearn.compose import ColumnTransformer
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import r2_score
-from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.linear_model import LinearRegression, Ridge, Lasso, ElasticNet
 from sklearn.model_selection import cross_val_score, GridSearchCV
 
-if __name__ == "__main__":
 
+# Splitting my numerical and categorical features
+numeric_features = ["mileage", "engine_power"]
+categorical_features = ["model_key", "fuel", "paint_color", "car_type", "private_parking_available", "has_gps", "has_air_conditioning", "automatic_car", "has_getaround_connect", "has_speed_regulator", "winter_tires"]
+
+# Regularized models available for the hyperparameter search
+search_models = {
+    "ridge": Ridge,
+    "lasso": Lasso,
+    "elasticnet": ElasticNet
+}
+
+# Regressors fitted on the sparse design matrix by default: their coordinate descent gives the same
+# solution on a sparse matrix. LinearRegression (lsqr) and Ridge (sparse_cg) would only solve it approximately
+sparse_regressors = (Lasso, ElasticNet)
+
+# Each kind of model has its own registered model, the API serves car_price_estimator_LR unless told otherwise (MODEL_NAME)
+registered_model_names = {
+    "none": "car_price_estimator_LR",
+    "ridge": "car_price_estimator_Ridge",
+    "lasso": "car_price_estimator_Lasso",
+    "elasticnet": "car_price_estimator_ElasticNet"
+}
+
+
+def build_pipeline(regressor, memory=None, sparse=None, categories='auto'):
+    '''
+    Returns the preprocessing and regression pipeline.
+    With `memory` (a directory or a joblib.Memory), the fitted preprocessing is cached
+    so it is not recomputed for every candidate of a hyperparameter search.
+    With `sparse`, the design matrix is a CSR matrix from the encoding to the regressor,
+    by default only for the regressors of `sparse_regressors`.
+    `categories` can give the categories of each categorical feature, when they are known in advance
+    '''
+    if sparse is None:
+        sparse = isinstance(regressor, sparse_regressors)
+
+    # Create pipeline for numeric features
+    numeric_transformer = Pipeline(steps=[
+        ('scaler', StandardScaler())
+    ])
+
+    # Create pipeline for categorical features
+    categorical_transformer = Pipeline(steps=[
+        ('encoder', OneHotEncoder(categories=categories, drop='first', sparse_output=sparse)) # first column will be dropped to avoid creating correlations between features
+        ])
+
+    # Use ColumnTranformer to make a preprocessor object that describes all the treatments to be done
+    # A sparse_threshold of 1 always stacks the outputs as a CSR matrix, whatever the density of the one-hot columns
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', numeric_transformer, numeric_features),
+            ('cat', categorical_transformer, categorical_features)
+        ],
+        sparse_threshold=1.0 if sparse else 0.0)
 
+    return Pipeline(steps=[
+    ("Preprocessing", preprocessor),
+    ("Regressor", regressor)
+    ], memory=memory)
+
+
+def build_search(search, alphas, l1_ratios, cv, n_jobs, memory):
+    '''
+    Returns a grid search over the regularization of a Ridge, Lasso or ElasticNet model
+    '''
+    param_grid = {"Regressor__alpha": alphas}
+    if search == "elasticnet":
+        param_grid["Regressor__l1_ratio"] = l1_ratios
+
+    # Candidates run in parallel, each fold's preprocessing is computed once thanks to the pipeline memory
+    return GridSearchCV(build_pipeline(search_models[search](), memory=memory), param_grid, cv=cv, n_jobs=n_jobs, scoring="r2")
+
+
+def log_candidates(grid_search):
+    '''
+    Logs every candidate of a fitted grid search as a child run of the active run
+    '''
+    results = grid_search.cv_results_
+    for i, params in enumerate(results["params"]):
+        with mlflow.start_run(run_name=f"candidate_{i}", nested=True):
+            mlflow.log_params(params)
+            mlflow.log_metrics({
+                "mean_test_r2": results["mean_test_score"][i],
+                "std_test_r2": results["std_test_score"][i],
+                "rank_test_r2": results["rank_test_score"][i],
+                "mean_fit_time": results["mean_fit_time"][i],
+            })
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--save-local", help="Also save the fitted model to this joblib file, to be served offline by the API (MODEL_PATH)")
+    parser.add_argument("--search", choices=["none"] + list(search_models), default="none", help="Hyperparameter search instead of a plain linear regression")
+    parser.add_argument("--alphas", nargs=3, type=float, default=[-3, 4, 50], metavar=("START", "STOP", "NUM"), help="Alpha grid, as np.logspace(START, STOP, NUM)")
+    parser.add_argument("--l1-ratios", nargs="+", type=float, default=[0.1, 0.5, 0.9], help="l1_ratio grid for ElasticNet")
+    parser.add_argument("--cv", type=int, default=10, help="Number of cross validation folds")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Parallel jobs for the search (-1 uses all cores)")
+    args = parser.parse_args()
 
     # Set your variables for your environment
     EXPERIMENT_NAME="car_price_estimator"
@@ -25,8 +126,8 @@ if __name__ == "__main__":
     run = client.create_run(experiment.experiment_id) # Creates a new run for a given experiment
 
 
-    # Call mlflow autolog
-    mlflow.sklearn.autolog()
+    # Call mlflow autolog, search candidates are logged as child runs by log_candidates
+    mlflow.sklearn.autolog(max_tuning_runs=0)
 
 
     # Read data
@@ -39,35 +140,17 @@ if __name__ == "__main__":
     X = data_pricing.drop(['rental_price_per_day'], axis=1)
     y = data_pricing['rental_price_per_day']
 
-    # Split our training set and our test set 
+    # Split our training set and our test set
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size =0.2, random_state = 42)
 
-    # Splitting my numerical and categorical features
-    numeric_features = ["mileage", "engine_power"]
-    categorical_features = ["model_key", "fuel", "paint_color", "car_type", "private_parking_available", "has_gps", "has_air_conditioning", "automatic_car", "has_getaround_connect", "has_speed_regulator", "winter_tires"]
-
-    # Create pipeline for numeric features
-    numeric_transformer = Pipeline(steps=[
-        ('scaler', StandardScaler())
-    ])
-
-    # Create pipeline for categorical features
-    categorical_transformer = Pipeline(steps=[
-        ('encoder', OneHotEncoder(drop='first')) # first column will be dropped to avoid creating correlations between features
-        ])
-
-    # Use ColumnTranformer to make a preprocessor object that describes all the treatments to be done
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('num', numeric_transformer, numeric_features),
-            ('cat', categorical_transformer, categorical_features)
-        ])
-
-    # Instantiating a linear regression model
-    model = Pipeline(steps=[
-    ("Preprocessing", preprocessor),
-    ("Regressor",LinearRegression())
-    ])
+    # Instantiating a linear regression model, or a search over regularized models
+    cache_dir = None
+    if args.search == "none":
+        model = build_pipeline(LinearRegression())
+    else:
+        cache_dir = tempfile.mkdtemp(prefix="car_price_estimator_")
+        alphas = np.logspace(args.alphas[0], args.alphas[1], int(args.alphas[2]))
+        model = build_search(args.search, alphas, args.l1_ratios, args.cv, args.n_jobs, cache_dir)
 
 
 
@@ -76,12 +159,28 @@ if __name__ == "__main__":
         # Fitting the model
         model.fit(X_train, y_train)
 
+        if args.search != "none":
+            log_candidates(model)
+            mlflow.log_param("search", args.search)
+            mlflow.log_params({"best_" + name: value for name, value in model.best_params_.items()})
+            mlflow.log_metric("test_r2", r2_score(y_test, model.predict(X_test)))
+            print(f"Best parameters: {model.best_params_} (mean R2 {model.best_score_:.4f})")
+
+            # Keep the best pipeline, without its cache directory
+            model = model.best_estimator_
+            model.set_params(memory=None)
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
         predictions = model.predict(X_train)
 
-        # Log model separately to have more flexibility on setup 
+        # Log model separately to have more flexibility on setup
         mlflow.sklearn.log_model(
             sk_model=model,
             artifact_path="car_price_estimator",
-            registered_model_name="car_price_estimator_LR",
+            registered_model_name=registered_model_names[args.search],
             signature=infer_signature(X_train, predictions)
-        )
\ No newline at end of file
+        )
+
+    if args.save_local:
+        joblib.dump(model, args.save_local)
+        print(f"Model saved to {args.save_local}")
@@ -0,0 +1,192 @@
+"""
+Out-of-core training of the car price estimator.
+
+The dataset (CSV or Parquet) is read by chunks and never held in memory:
+a first pass learns the categories of each categorical feature and the scaler
+statistics, a second pass fits the regression either by accumulating the normal
+equations (X^T X, X^T y), which gives the same linear model as LinearRegression,
+or with SGDRegressor.partial_fit.
+
+The normal equations are solved exactly, on the sparse design matrix: the model
+matches LinearRegression on the full data to ~1e-10 (test_train_streaming.py).
+
+    python train_streaming.py --data rentals.parquet --chunksize 100000 --solver normal
+"""
+import argparse
+
+import joblib
+import mlflow
+from mlflow.models.signature import infer_signature
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import scipy.sparse as sp
+from sklearn.linear_model import LinearRegression, SGDRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from train import build_pipeline, numeric_features, categorical_features
+
+
+target = "rental_price_per_day"
+features = numeric_features + categorical_features
+
+
+def iter_chunks(path, chunksize):
+    '''
+    Reads a CSV or Parquet file by chunks of `chunksize` rows
+    '''
+    if path.endswith(".parquet"):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=features + [target]):
+            yield batch.to_pandas()
+    else:
+        try:
+            chunks = pd.read_csv(path, chunksize=chunksize, usecols=features + [target])
+        except pd.errors.EmptyDataError:
+            # Not even a header, no rows
+            return
+        for chunk in chunks:
+            yield chunk
+
+
+def learn_vocabulary(path, chunksize):
+    '''
+    First pass: returns the sorted categories of each categorical feature and a scaler fitted on the numeric features
+    '''
+    vocabulary = {column: set() for column in categorical_features}
+    scaler = StandardScaler()
+    for chunk in iter_chunks(path, chunksize):
+        if chunk.empty:
+            continue
+        for column in categorical_features:
+            vocabulary[column].update(chunk[column].unique().tolist())
+        scaler.partial_fit(chunk[numeric_features])
+    if not hasattr(scaler, "n_samples_seen_"):
+        raise ValueError(f"No rows to train on in {path}")
+
+    # Sorted like OneHotEncoder does, so the same category is dropped
+    categories = [sorted(vocabulary[column]) for column in categorical_features]
+    return categories, scaler
+
+
+def build_preprocessor(path, chunksize, categories, scaler):
+    '''
+    Returns the fitted ColumnTransformer of the pipeline, using the statistics of the whole dataset
+    '''
+    preprocessor = build_pipeline(LinearRegression(), sparse=True, categories=categories).steps[0][1]
+    preprocessor.fit(next(chunk for chunk in iter_chunks(path, chunksize) if not chunk.empty)[features])
+
+    # The scaler was only fitted on the first chunk, use the statistics of all the chunks instead
+    fitted_scaler = preprocessor.named_transformers_['num'].named_steps['scaler']
+    for attribute in ("mean_", "var_", "scale_", "n_samples_seen_"):
+        setattr(fitted_scaler, attribute, getattr(scaler, attribute))
+    return preprocessor
+
+
+def fit_normal_equations(path, chunksize, preprocessor):
+    '''
+    Second pass: accumulates X^T X and X^T y by chunk and solves the least squares problem
+    '''
+    # Intercept and one column per encoded feature
+    n_features = 1 + len(preprocessor.get_feature_names_out())
+    xtx = np.zeros((n_features, n_features))
+    xty = np.zeros(n_features)
+    rows = 0
+    for chunk in iter_chunks(path, chunksize):
+        if chunk.empty:
+            continue
+        X = preprocessor.transform(chunk[features])
+        # First column of ones for the intercept
+        X = sp.hstack([np.ones((X.shape[0], 1)), X]).tocsr()
+        y = chunk[target].to_numpy(dtype=float)
+        xtx += (X.T @ X).toarray()
+        xty += X.T @ y
+        rows += X.shape[0]
+    if not rows:
+        raise ValueError(f"No rows to fit in {path}")
+
+    solution = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+
+    regressor = LinearRegression()
+    regressor.intercept_ = solution[0]
+    regressor.coef_ = solution[1:]
+    regressor.n_features_in_ = n_features - 1
+    return regressor
+
+
+def fit_sgd(path, chunksize, preprocessor, epochs):
+    '''
+    Second pass: fits a SGDRegressor chunk by chunk, `epochs` times over the file
+    '''
+    regressor = SGDRegressor(random_state=42)
+    for epoch in range(epochs):
+        for chunk in iter_chunks(path, chunksize):
+            if chunk.empty:
+                continue
+            regressor.partial_fit(preprocessor.transform(chunk[features]), chunk[target])
+    return regressor
+
+
+def fit_streaming(path, chunksize, solver="normal", epochs=5):
+    '''
+    Returns the fitted pipeline without ever loading the whole dataset
+    '''
+    categories, scaler = learn_vocabulary(path, chunksize)
+    preprocessor = build_preprocessor(path, chunksize, categories, scaler)
+    if solver == "normal":
+        regressor = fit_normal_equations(path, chunksize, preprocessor)
+    else:
+        regressor = fit_sgd(path, chunksize, preprocessor, epochs)
+
+    return Pipeline(steps=[
+    ("Preprocessing", preprocessor),
+    ("Regressor", regressor)
+    ])
+
+
+def streaming_r2(model, path, chunksize):
+    '''
+    Computes the R2 score of the model on the dataset, by chunks
+    '''
+    n, total, total_squares, residuals = 0, 0.0, 0.0, 0.0
+    for chunk in iter_chunks(path, chunksize):
+        y = chunk[target].to_numpy(dtype=float)
+        residuals += ((y - model.predict(chunk[features])) ** 2).sum()
+        n += len(y)
+        total += y.sum()
+        total_squares += (y ** 2).sum()
+    return 1 - residuals / (total_squares - total ** 2 / n)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="get_around_pricing_project.csv", help="CSV or Parquet file of rentals")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Rows read at once")
+    parser.add_argument("--solver", choices=["normal", "sgd"], default="normal")
+    parser.add_argument("--epochs", type=int, default=5, help="Passes over the data for the sgd solver")
+    parser.add_argument("--save-local", help="Also save the fitted model to this joblib file")
+    args = parser.parse_args()
+
+    # Set your variables for your environment
+    EXPERIMENT_NAME="car_price_estimator"
+    mlflow.set_experiment(EXPERIMENT_NAME)
+
+    with mlflow.start_run(run_name="streaming"):
+        model = fit_streaming(args.data, args.chunksize, args.solver, args.epochs)
+
+        mlflow.log_params({"solver": args.solver, "chunksize": args.chunksize, "data": args.data})
+        mlflow.log_metric("training_r2", streaming_r2(model, args.data, args.chunksize))
+
+        sample = next(iter_chunks(args.data, 1000))[features]
+        mlflow.sklearn.log_model(
+            sk_model=model,
+            artifact_path="car_price_estimator",
+            # Registered apart from the car_price_estimator_LR served by the API
+            registered_model_name="car_price_estimator_streaming_LR" if args.solver == "normal" else "car_price_estimator_SGD",
+            signature=infer_signature(sample, model.predict(sample))
+        )
+
+    if args.save_local:
+        joblib.dump(model, args.save_local)
+        print(f"Model saved to {args.save_local}")
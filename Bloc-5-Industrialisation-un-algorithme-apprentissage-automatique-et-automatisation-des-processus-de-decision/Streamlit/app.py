@@ -8,6 +8,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+import delay_analysis
+import rental_chains
+import scenario_grid
+import simulator
+
 
 ### Config
 st.set_page_config(
@@ -16,99 +21,14 @@ st.set_page_config(
     layout="wide"
 )
 
-# Importing Dataset
-@st.cache
-def load_data_pricing():
-  data_pricing =  pd.read_csv("get_around_pricing_project.csv")
-  return data_pricing
-
-@st.cache
-def load_data_delay():
-  data_delay = pd.read_excel("get_around_delay_analysis.xlsx")
-  return data_delay
-
-
-data_pricing = load_data_pricing()
-data_delay = load_data_delay()
-
-
-# Findind number of unique cars
-number_of_cars = len(data_delay['car_id'].unique())
-
-# Finding average rental price
-car_average_rental_price_per_day = round(data_pricing["rental_price_per_day"].mean())
-
-# Finding number of rentals
-number_of_rentals = data_delay.shape[0]
-
-# Removing NaN values about late checkout from the dataset
-data_delay_without_nan = data_delay[data_delay["delay_at_checkout_in_minutes"].isna() == False]
-
-print (f"There are {data_delay_without_nan.shape[0]} rentals in the dataset 'data_delay_without_nan'")
-
-def check_if_late(late):
-    if late > 0:
-        return "late"
-    else:
-        return "not late"
-
-# Creating a new column to categorize lateness
-data_delay_without_nan["delay"] = data_delay_without_nan["delay_at_checkout_in_minutes"].apply(check_if_late)
-
-# Creating a new DataFrame with values counts for the lateness category
-new_df = (data_delay_without_nan['delay'].value_counts(normalize=True)*100).rename_axis('delay').reset_index(name='counts')
-
-# Creating a new DataFrame with values counts for the state category
-df_rental_state = (data_delay['state'].value_counts(normalize=True)*100).rename_axis('state').reset_index(name='counts')
-
-# Making a list of all the previous_ended_rental_id
-lst_previous_rental_id = data_delay["previous_ended_rental_id"]
-
-# Removing all NaN values from this list
-lst_previous_rental_id = [x for x in lst_previous_rental_id if np.isnan(x) == False]
-
-# Creating a new df with all the rental id found in my previous list to see if they were late or not
-df_previous_rental_id = data_delay[data_delay["rental_id"].isin(lst_previous_rental_id)]
-
-# Merging the two df to have a the same row both the previous rental id and the following rental id
-df_merged = df_previous_rental_id.merge(data_delay, how='inner', left_on='rental_id', right_on='previous_ended_rental_id')
-
-# Removing useless columns
-df_merged.drop(['state_x', 'previous_ended_rental_id_y','previous_ended_rental_id_x', 'time_delta_with_previous_rental_in_minutes_x', 'car_id_y', 'delay_at_checkout_in_minutes_y'], axis=1, inplace=True)
-print (f"After cleaning the dataset, there are {df_merged.shape[0]} rows left to use from {len(data_delay)} rows originally.")
-
-# Creating a new DataFrame when checkout was late
-df_merged_and_late = df_merged[df_merged["delay_at_checkout_in_minutes_x"] > 0]
-
-# Creating a new DataFrame when checkout was done on time
-df_merged_and_not_late = df_merged[df_merged["delay_at_checkout_in_minutes_x"] <= 0]
-
-# Creating a new DataFrame with values counts of state for late checkout
-df_merged_and_late_value_counts = (df_merged_and_late['state_y'].value_counts(normalize=True)*100).rename_axis('state_y').reset_index(name='counts')
-
-# Creating a new DataFrame with values counts of state for checkout on time
-df_merged_and_not_late_value_counts = (df_merged_and_not_late['state_y'].value_counts(normalize=True)*100).rename_axis('state_y').reset_index(name='counts')
-
-# Creating a new column to find if the checkout of the previous rental happened after the start of the following rental
-df_merged_and_late["wait_time_in_minutes"] = df_merged_and_late["delay_at_checkout_in_minutes_x"] - df_merged_and_late["time_delta_with_previous_rental_in_minutes_y"]
-
-# Keeping only cases when the checkout of the previous rental happened after the start of the following rental
-df_merged_way_too_late = df_merged_and_late[df_merged_and_late["wait_time_in_minutes"] > 0]
-
-# Creating a new DataFrame with values counts of state when the checkout of the previous rental happened after the start of the following rental
-df_merged_way_too_late2 = (df_merged_way_too_late['state_y'].value_counts(normalize=True)*100).rename_axis('state_y').reset_index(name='counts')
-
-# Checking if there is a difference in cancelation rate between mobile and connect checking type
-df_merged_and_late_mobile = df_merged_and_late[df_merged_and_late["checkin_type_x"] == "mobile"]
-df_merged_and_late_connect = df_merged_and_late[df_merged_and_late["checkin_type_x"] == "connect"]
-
-
 def main():
 
     pages = {
         'Project': project,
         'GetAround Analysis': analysis,
         'Try your own variables': variables,
+        'Late checkout cascades': cascades,
+        'Scenario grid': scenarios,
         }
 
     if "page" not in st.session_state:
@@ -161,6 +81,8 @@ def project():
 
 def analysis():
 
+    # Derived tables, computed on the first visit of this page for each version of the datasets
+    results = delay_analysis.get_analysis()
 
     ################################################################ EXPLORATION AND VISUALISATION START
     ################################################################ EXPLORATION AND VISUALISATION START
@@ -183,12 +105,12 @@ def analysis():
     st.write('\n')
     st.write('\n')
     
-    st.write (f"There are {number_of_cars} different cars in the dataset.")
-    st.write (f"The average rental price of a car per day is {car_average_rental_price_per_day}$.")
-    st.write (f"There are {number_of_rentals} rentals in the dataset.")
+    st.write (f"There are {results.number_of_cars} different cars in the dataset.")
+    st.write (f"The average rental price of a car per day is {results.car_average_rental_price_per_day}$.")
+    st.write (f"There are {results.number_of_rentals} rentals in the dataset.")
 
     # Bar chart - lateness on whole dataset after removal of NaN
-    fig = px.bar(new_df, 
+    fig = px.bar(results.new_df, 
                 x="delay", 
                 y="counts", 
                 color="delay", 
@@ -201,7 +123,7 @@ def analysis():
     st.plotly_chart(fig)
 
     # Bar chart - state on Whole dataset
-    fig = px.bar(df_rental_state, 
+    fig = px.bar(results.df_rental_state, 
                 x="state", 
                 y="counts", 
                 color="state", 
@@ -216,7 +138,7 @@ def analysis():
     st.write("Now I clean my dataset to keep only rows where I can find what the previous rental ID was to determine if the previous checkout was late or not.")
 
     # Bar chart - state for late checkout
-    fig = px.bar(df_merged_and_late_value_counts, 
+    fig = px.bar(results.df_merged_and_late_value_counts, 
                 x="state_y", 
                 y="counts", 
                 color="state_y", 
@@ -229,7 +151,7 @@ def analysis():
     st.plotly_chart(fig)
 
     # Bar chart - state for checkout on time
-    fig2 = px.bar(df_merged_and_not_late_value_counts, 
+    fig2 = px.bar(results.df_merged_and_not_late_value_counts, 
                 x="state_y", 
                 y="counts", 
                 color="state_y", 
@@ -241,11 +163,11 @@ def analysis():
     fig2.update_layout(title_x=0.5, yaxis={'visible': False}, xaxis={'visible': True}, legend_title="", title_text="Cancelation rate if checkout was not late", template='plotly_dark', xaxis_title='', showlegend=False)
     st.plotly_chart(fig2)
 
-    st.write (f"{df_merged_way_too_late['state_y'].value_counts()[0]} ended rentals left when the checkout happened after the start of the following rental")
-    st.write (f"{df_merged_way_too_late['state_y'].value_counts()[1]} canceled rentals left when the checkout happened after the start of the following rental")
+    st.write (f"{results.df_merged_way_too_late['state_y'].value_counts().iloc[0]} ended rentals left when the checkout happened after the start of the following rental")
+    st.write (f"{results.df_merged_way_too_late['state_y'].value_counts().iloc[1]} canceled rentals left when the checkout happened after the start of the following rental")
 
     # Bar chart
-    fig = px.bar(df_merged_way_too_late2, 
+    fig = px.bar(results.df_merged_way_too_late2, 
                 x="state_y", 
                 y="counts", 
                 color="state_y", 
@@ -258,8 +180,8 @@ def analysis():
     fig.update_layout(title_x=0.5, yaxis={'visible': False}, xaxis={'visible': True}, legend_title="", title_text="Proportion of state when checkout happened after the expected start of the following rental", template='plotly_dark', xaxis_title='', showlegend=False)
     st.plotly_chart(fig)
 
-    st.write (f"Connect checkin has a {round((df_merged_and_late_connect['state_y'].value_counts(normalize=True)*100)[1],2)}% cancelation rate")
-    st.write (f"Mobile checkin has a {round((df_merged_and_late_mobile['state_y'].value_counts(normalize=True)*100)[1],2)}% cancelation rate")
+    st.write (f"Connect checkin has a {round((results.df_merged_and_late_connect['state_y'].value_counts(normalize=True)*100).iloc[1],2)}% cancelation rate")
+    st.write (f"Mobile checkin has a {round((results.df_merged_and_late_mobile['state_y'].value_counts(normalize=True)*100).iloc[1],2)}% cancelation rate")
 
     st.markdown("<h2 style='text-align: center;'>Conclusion from visualisations and data exploration</h2>", unsafe_allow_html=True)
 
@@ -312,9 +234,6 @@ def variables():
     ################################################################ TEST YOUR OWN VARIABLES START
 
     ################################################################ USER INPUT
-    data_pricing = load_data_pricing()
-    data_delay = load_data_delay()
-
     checkin_type = st.radio(
      "Chose a Check-in Type",
      ('connect', 'mobile', 'both'))
@@ -323,85 +242,11 @@ def variables():
 
     ################################################################ DATA MANIPULATION
 
-    # Finding average rental price
-    car_average_rental_price_per_day = round(data_pricing["rental_price_per_day"].mean())
-
-    # Making a list of all the previous_ended_rental_id
-    lst_previous_rental_id = data_delay["previous_ended_rental_id"]
-
-    # Removing all NaN values from this list
-    lst_previous_rental_id = [x for x in lst_previous_rental_id if np.isnan(x) == False]
-
-    # Creating a new df with all the rental id found in my previous list to see if they were late or not
-    df_previous_rental_id = data_delay[data_delay["rental_id"].isin(lst_previous_rental_id)]
-
-    # Merging the two df to have a the same row both the previous rental id and the following rental id
-    df_merged = df_previous_rental_id.merge(data_delay, how='inner', left_on='rental_id', right_on='previous_ended_rental_id')
-
-    # Removing useless columns
-    df_merged.drop(['state_x', 'previous_ended_rental_id_y','previous_ended_rental_id_x', 'time_delta_with_previous_rental_in_minutes_x', 'car_id_y', 'delay_at_checkout_in_minutes_y'], axis=1, inplace=True)
-
-    # Creating a new DataFrame when checkout was late
-    df_merged_and_late = df_merged[df_merged["delay_at_checkout_in_minutes_x"] > 0]
-
-    # Creating a new column to find if the checkout of the previous rental happened after the start of the following rental
-    df_merged_and_late["wait_time_in_minutes"] = df_merged_and_late["delay_at_checkout_in_minutes_x"] - df_merged_and_late["time_delta_with_previous_rental_in_minutes_y"]
-
-    # Creating a new DataFrame with only ended state
-    df_true_good_cases = data_delay[data_delay["state"] == "ended"]
-
-    # Creating a new DataFrame with all the cases having the data I need
-    df_good_cases = df_merged.copy()
-    df_good_cases = df_good_cases[df_good_cases["state_y"] == "ended"]
-
-    # If checkin_type is not both, I filter the two previous DataFrames
-    if checkin_type != 'both':
-        df_good_cases = df_good_cases[df_good_cases["checkin_type_x"] == checkin_type]
-        df_true_good_cases = df_true_good_cases[df_true_good_cases["checkin_type"] == checkin_type]
-
-    # I keep only the rows where the time delta is higher or equal than the new time delta
-    df_new_time_delta_good_cases = df_good_cases[df_good_cases["time_delta_with_previous_rental_in_minutes_y"] >= new_delta]
+    # Only the threshold changes with the slider, the simulator answers it from precomputed sorted arrays
+    result = simulator.get_simulator().simulate(checkin_type, new_delta)
 
-    # Creating a money lost variable
-    money_lost = round(round((len(df_good_cases) - len(df_new_time_delta_good_cases))/len(df_good_cases)*100, 2) * len(df_true_good_cases) / 100) * car_average_rental_price_per_day
-
-    # Creating a new DataFrame with only canceled state
-    df_canceled_cases = df_merged[df_merged["state_y"] == "canceled"]
-
-    # If checkin_type is not both, I filter my previous DataFrames
-    if checkin_type != "both":
-        df_canceled_cases = df_canceled_cases[df_canceled_cases["checkin_type_x"] == checkin_type]
-        df_merged = df_merged[df_merged["checkin_type_x"] == checkin_type]
-        data_delay = data_delay[data_delay["checkin_type"] == checkin_type]
-
-    # Finding amount of rows having all the data I need
-    row_all_data = len(df_merged)
-
-    # Creating a new DataFrame with canceled and late cases
-    df_canceled_and_late_cases = df_canceled_cases[df_canceled_cases["delay_at_checkout_in_minutes_x"] > 0]
-
-    # Creating a new delay column to find out if the next rental owner had to wait or not
-    df_canceled_and_late_cases["delay"] = df_canceled_and_late_cases["delay_at_checkout_in_minutes_x"] - df_canceled_and_late_cases["time_delta_with_previous_rental_in_minutes_y"]
-
-    # I keep only cases where the next owner had to wait
-    df_canceled_and_late_cases = df_canceled_and_late_cases[df_canceled_and_late_cases["delay"] > 0]
-
-    # I find the percentage of cases where the next owner had to wait
-    rate_too_late_canceled_case = len(df_canceled_and_late_cases) * 100 / row_all_data
-
-    # Creating a new DataFrame with cases where the next owner had to wait
-    df_new_time_delta_bad_cases = df_canceled_and_late_cases[df_canceled_and_late_cases["delay"] > new_delta]
-
-    # Finding number of cancelation prevented
-    cancelation_prevented = len(df_canceled_and_late_cases) - len(df_new_time_delta_bad_cases)
-    
-    # Finding percentage of cancelation prevented
-    rate_cancelation_prevented = (cancelation_prevented) * 100 / len(df_canceled_and_late_cases)
-
-    cancelation_prevented = len(df_canceled_and_late_cases) - len(df_new_time_delta_bad_cases)
-
-    total_estimated_cancelation_prevented = len(data_delay) * (rate_too_late_canceled_case/100)
-    money_saved = round(total_estimated_cancelation_prevented * ((rate_cancelation_prevented)/100) * car_average_rental_price_per_day)
+    money_lost = result.money_lost
+    money_saved = result.money_saved
 
     data = {"Check-in type: " + checkin_type:['Lost', 'Saved'], 
             'Amount':[money_lost, money_saved]}
@@ -424,6 +269,17 @@ def variables():
     fig5.update_yaxes(range=[0,1800000])
     st.plotly_chart(fig5)
 
+    # Line chart - trade-off for every minimum time delta
+    curve = simulator.get_simulator().curve(checkin_type)
+    fig6 = px.line(curve.rename(columns={"money_lost": "Lost", "money_saved": "Saved"}),
+                x="threshold",
+                y=["Lost", "Saved"],
+                color_discrete_sequence=['#FF0000', '#FFD700'],
+                width=1000, height=500)
+    fig6.add_vline(x=new_delta, line_dash="dash", line_color="white")
+    fig6.update_layout(title_x=0.5, legend_title="", title_text="Money lost and saved for every minimum time delta with " + checkin_type + " check-in type.", template='plotly_dark', xaxis_title='Minimum time delta (minutes)', yaxis_title='Amount ($)')
+    st.plotly_chart(fig6)
+
 ################################################################ RESULT EXPLANATION
 
     st.markdown("<h2 style='text-align: center;'>Explanation for this result</h2>", unsafe_allow_html=True)
@@ -431,31 +287,31 @@ def variables():
     st.write('\n')
     st.write('\n')
     st.write('\n')
-    st.write (f"Check-in type: {checkin_type} = {len(data_delay)} cases")
-    st.write (f"Cleaning phase: I keep only rentals where we can see the previous rental id and if it was late or not, there are {df_merged.shape[0]} cases left.")
+    st.write (f"Check-in type: {checkin_type} = {result.rentals} cases")
+    st.write (f"Cleaning phase: I keep only rentals where we can see the previous rental id and if it was late or not, there are {result.linked_rentals} cases left.")
     st.write('\n')
     st.write('\n')
 
     st.markdown("<h5 style='text-align: left;'>Ended cases</h5>", unsafe_allow_html=True)
 
     st.write('\n')
-    st.write (f"Keeping only ended cases we have {len(df_good_cases)} cases left.")
-    st.write(f"With a minimum time delta of {new_delta} minutes we have {len(df_new_time_delta_good_cases)} cases left. We lost {len(df_good_cases) - len(df_new_time_delta_good_cases)} cases from our {len(df_good_cases)} cases.")
-    st.write (f"{len(df_good_cases) - len(df_new_time_delta_good_cases)} represents {round((len(df_good_cases) - len(df_new_time_delta_good_cases))/len(df_good_cases)*100, 2)}% of the whole left cases.")
-    st.write (f"If we try to apply these cleaning steps to our whole data set. We would be left with {len(df_true_good_cases)} cases")
-    st.write (f"{round((len(df_good_cases) - len(df_new_time_delta_good_cases))/len(df_good_cases)*100, 2)}% would be a loss of {round(round((len(df_good_cases) - len(df_new_time_delta_good_cases))/len(df_good_cases)*100, 2) * len(df_true_good_cases) / 100)} rentals for {money_lost}$.")
+    st.write (f"Keeping only ended cases we have {result.ended} cases left.")
+    st.write(f"With a minimum time delta of {new_delta} minutes we have {result.ended_kept} cases left. We lost {result.ended_lost} cases from our {result.ended} cases.")
+    st.write (f"{result.ended_lost} represents {result.lost_rate}% of the whole left cases.")
+    st.write (f"If we try to apply these cleaning steps to our whole data set. We would be left with {result.all_ended} cases")
+    st.write (f"{result.lost_rate}% would be a loss of {result.rentals_lost} rentals for {money_lost}$.")
     st.write('\n')
     st.write('\n')
 
     st.markdown("<h5 style='text-align: left;'>Canceled cases</h5>", unsafe_allow_html=True)
 
     st.write('\n')
-    st.write (f"Keeping only canceled cases we have {len(df_canceled_cases)} cases left.")
-    st.write (f"{len(df_canceled_and_late_cases)} of these cases where late and the next owner did not have the car on time.")
-    st.write (f"With a minimum time delta of {new_delta} minutes we have {len(df_new_time_delta_bad_cases)} cases left. We saved {cancelation_prevented} cases from our {len(df_canceled_and_late_cases)} cases. ")
-    st.write (f"{cancelation_prevented} represents {round(rate_cancelation_prevented,2)}% of these {len(df_canceled_and_late_cases)} cases.")
-    st.write (f"If we try to apply these cleaning steps to our whole data set. We would be left with {round(total_estimated_cancelation_prevented)} cases of check-in type '{checkin_type}' that were canceled and the previous owner was so late that the checkout happened after the expected start of the next rental.")
-    st.write (f"If we decide to consider that a cancelation due to lateness happens only when the new car owner has to wait, {round(rate_cancelation_prevented,2)}% would represents {round(round(total_estimated_cancelation_prevented) * (round(rate_cancelation_prevented)/100), 0)} rentals saved for {money_saved}$.")
+    st.write (f"Keeping only canceled cases we have {result.canceled} cases left.")
+    st.write (f"{result.canceled_late} of these cases where late and the next owner did not have the car on time.")
+    st.write (f"With a minimum time delta of {new_delta} minutes we have {result.canceled_late_left} cases left. We saved {result.cancelation_prevented} cases from our {result.canceled_late} cases. ")
+    st.write (f"{result.cancelation_prevented} represents {round(result.rate_cancelation_prevented,2)}% of these {result.canceled_late} cases.")
+    st.write (f"If we try to apply these cleaning steps to our whole data set. We would be left with {round(result.total_estimated_cancelation_prevented)} cases of check-in type '{checkin_type}' that were canceled and the previous owner was so late that the checkout happened after the expected start of the next rental.")
+    st.write (f"If we decide to consider that a cancelation due to lateness happens only when the new car owner has to wait, {round(result.rate_cancelation_prevented,2)}% would represents {round(round(result.total_estimated_cancelation_prevented) * (round(result.rate_cancelation_prevented)/100), 0)} rentals saved for {money_saved}$.")
 
     st.markdown("<h5 style='text-align: left;'>Conclusion</h5>", unsafe_allow_html=True)
 
@@ -475,6 +331,75 @@ def variables():
     ################################################################ TEST YOUR OWN VARIABLES END
     ################################################################ TEST YOUR OWN VARIABLES END
 
+def cascades():
+    st.markdown("<h1 style='text-align: center;'>Late checkout cascades</h1>", unsafe_allow_html=True)
+
+    st.write('\n')
+    st.write('\n')
+    st.write('\n')
+
+    # Chains of consecutive rentals of each car, built once per version of the dataset
+    index = rental_chains.get_chain_index()
+    df_cascades = index.cascades()
+    chain_lengths = index.chain_lengths()
+
+    st.write (f"There are {len(index)} chains of at least two consecutive rentals, the longest one has {chain_lengths.max()} rentals.")
+    st.write (f"{len(df_cascades)} late checkouts made at least one following driver wait, {(df_cascades['depth'] >= 2).sum()} of them delayed two rentals or more in a row.")
+
+    # Bar chart - depth of the cascades
+    df_depth = df_cascades['depth'].value_counts().sort_index().rename_axis('depth').reset_index(name='counts')
+    fig = px.bar(df_depth, 
+                x="depth", 
+                y="counts", 
+                title="----------", 
+                color_discrete_sequence=['#880808'],
+                text="counts",
+                width=1000, height=500,)
+    fig.update_traces(textposition='outside')
+    fig.update_layout(title_x=0.5, yaxis={'visible': False}, xaxis={'visible': True, 'dtick': 1}, title_text="Number of following rentals that waited after a late checkout", template='plotly_dark', xaxis_title='Depth of the cascade', showlegend=False)
+    st.plotly_chart(fig)
+
+    st.markdown("<h5 style='text-align: left;'>Longest cumulative waits</h5>", unsafe_allow_html=True)
+    st.dataframe(df_cascades.sort_values('cumulative_wait_in_minutes', ascending=False).head(20))
+
+    st.markdown("<h5 style='text-align: left;'>Follow a cascade</h5>", unsafe_allow_html=True)
+    rental_id = st.selectbox("Chose a late checkout", df_cascades.sort_values(['depth', 'cumulative_wait_in_minutes'], ascending=False)['rental_id'])
+    if rental_id is not None:
+        cascade = index.cascade(rental_id)
+        st.write (f"The late checkout of rental {rental_id} made {cascade.depth} following rentals wait, {round(cascade.cumulative_wait)} minutes in total, and {len(cascade.canceled)} canceled rentals had to wait.")
+        st.dataframe(index.chain_frame(rental_id))
+
+def scenarios():
+    st.markdown("<h1 style='text-align: center;'>Scenario grid</h1>", unsafe_allow_html=True)
+
+    st.write('\n')
+    st.write('\n')
+    st.write('\n')
+
+    # Every threshold for every check-in scope, precomputed by scenario_grid.py
+    grid = scenario_grid.load_grid()
+    grid["net"] = grid["money_saved"] - grid["money_lost"]
+
+    metrics = {'Saved minus lost': 'net', 'Lost': 'money_lost', 'Saved': 'money_saved'}
+    metric = st.radio("Chose a value", tuple(metrics.keys()))
+    max_threshold = st.slider('Chose the longest minimum delta time', 30, int(grid["threshold"].max()), int(grid["threshold"].max()), step=30)
+
+    df_heatmap = grid[grid["threshold"] <= max_threshold].pivot(index="checkin_type", columns="threshold", values=metrics[metric])
+
+    # Heatmap - money for every (threshold, scope) combination
+    fig = px.imshow(df_heatmap,
+                aspect="auto",
+                color_continuous_scale='RdYlGn' if metrics[metric] == 'net' else 'Reds' if metrics[metric] == 'money_lost' else 'YlOrBr',
+                labels={'x': 'Minimum time delta (minutes)', 'y': 'Check-in type', 'color': 'Amount ($)'},
+                width=1000, height=400)
+    fig.update_layout(title_x=0.5, title_text=metric + " for every minimum time delta and check-in type", template='plotly_dark')
+    st.plotly_chart(fig)
+
+    # Best threshold of each scope
+    best = grid.loc[grid[grid["threshold"] <= max_threshold].groupby("checkin_type", observed=True)["net"].idxmax()]
+    st.markdown("<h5 style='text-align: left;'>Best minimum time delta for each check-in type</h5>", unsafe_allow_html=True)
+    st.dataframe(best[["checkin_type", "threshold", "money_lost", "money_saved", "net"]].reset_index(drop=True))
+
 if __name__ == "__main__":
     main()
 
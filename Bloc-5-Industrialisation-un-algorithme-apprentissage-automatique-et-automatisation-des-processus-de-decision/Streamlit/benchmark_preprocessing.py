@@ -0,0 +1,104 @@
+"""
+Benchmark of the rental delay preprocessing, legacy loops against vectorized operations.
+
+The delay dataset is upsampled (100x by default) with shifted rental and car ids,
+so the previous rental links stay consistent inside each copy:
+
+    python benchmark_preprocessing.py --factors 1 10 100 --output preprocessing_benchmark.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_cache
+from delay_analysis import UNUSED_LINK_COLUMNS, label_lateness, link_previous_rentals
+
+
+def upsample(data_delay, factor):
+    '''
+    Returns `factor` copies of the dataset, each with its own rental and car ids
+    '''
+    offset = int(max(data_delay["rental_id"].max(), data_delay["car_id"].max())) + 1
+    copies = []
+    for i in range(factor):
+        copy = data_delay.copy()
+        copy["rental_id"] += i * offset
+        copy["car_id"] += i * offset
+        copy["previous_ended_rental_id"] += i * offset
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def check_if_late(late):
+    if late > 0:
+        return "late"
+    else:
+        return "not late"
+
+
+def legacy_preprocessing(data_delay):
+    '''
+    The preprocessing as the dashboard used to do it, with a list comprehension and a row-wise apply
+    '''
+    data_delay_without_nan = data_delay[data_delay["delay_at_checkout_in_minutes"].isna() == False].copy()
+    data_delay_without_nan["delay"] = data_delay_without_nan["delay_at_checkout_in_minutes"].apply(check_if_late)
+
+    lst_previous_rental_id = [x for x in data_delay["previous_ended_rental_id"] if np.isnan(x) == False]
+    df_previous_rental_id = data_delay[data_delay["rental_id"].isin(lst_previous_rental_id)]
+    df_merged = df_previous_rental_id.merge(data_delay, how='inner', left_on='rental_id', right_on='previous_ended_rental_id')
+    df_merged.drop(UNUSED_LINK_COLUMNS, axis=1, inplace=True)
+    return data_delay_without_nan, df_merged
+
+
+def vectorized_preprocessing(data_delay):
+    return label_lateness(data_delay), link_previous_rentals(data_delay)
+
+
+def best_time(function, data, repeat):
+    '''
+    Returns the best of `repeat` runs, in seconds, and the result of the last one
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(data)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--factors", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    data_delay = data_cache.load("delay")
+
+    results = []
+    for factor in args.factors:
+        upsampled = upsample(data_delay, factor)
+        legacy_seconds, legacy = best_time(legacy_preprocessing, upsampled, args.repeat)
+        vectorized_seconds, vectorized = best_time(vectorized_preprocessing, upsampled, args.repeat)
+
+        # Both versions must give the same tables
+        same = legacy[0].equals(vectorized[0]) and legacy[1].reset_index(drop=True).equals(vectorized[1].reset_index(drop=True))
+
+        result = {
+            "factor": factor,
+            "rows": len(upsampled),
+            "linked_rows": len(vectorized[1]),
+            "legacy_seconds": round(legacy_seconds, 4),
+            "vectorized_seconds": round(vectorized_seconds, 4),
+            "speedup": round(legacy_seconds / vectorized_seconds, 1),
+            "same_result": same,
+        }
+        print(json.dumps(result))
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,123 @@
+"""
+Typed Parquet copies of the GetAround datasets.
+
+Parsing the Excel file with openpyxl is the slowest part of the dashboard boot,
+so each dataset is converted once to Parquet, with categorical dtypes for the
+text columns. The copy is stamped with the SHA-256 of its source file and rebuilt
+only when the source changes. Run it once to prebuild the copies:
+
+    python data_cache.py
+"""
+import hashlib
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("DATA_CACHE_DIR", os.path.join(HERE, "cache"))
+
+# Key of the source hash in the Parquet metadata
+HASH_KEY = b"source_sha256"
+
+# Source file, reader and categorical columns of each dataset
+DATASETS = {
+    "pricing": {
+        "source": "get_around_pricing_project.csv",
+        "read": pd.read_csv,
+        "categories": ["model_key", "fuel", "paint_color", "car_type"],
+    },
+    "delay": {
+        "source": "get_around_delay_analysis.xlsx",
+        "read": pd.read_excel,
+        "categories": ["checkin_type", "state"],
+    },
+}
+
+
+def source_hash(path):
+    '''
+    Returns the SHA-256 of a file, read by blocks
+    '''
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(name):
+    return os.path.join(CACHE_DIR, f"{name}.parquet")
+
+
+def cached_hash(name):
+    '''
+    Returns the source hash stamped on the cached copy, None when there is no copy
+    '''
+    path = cache_path(name)
+    if not os.path.exists(path):
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    return metadata.get(HASH_KEY, b"").decode() or None
+
+
+def build(name, digest=None):
+    '''
+    Parses the source file of a dataset and writes its typed Parquet copy
+    '''
+    dataset = DATASETS[name]
+    source = os.path.join(HERE, dataset["source"])
+    digest = digest or source_hash(source)
+
+    data = dataset["read"](source)
+    for column in dataset["categories"]:
+        data[column] = data[column].astype("category")
+
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), HASH_KEY: digest.encode()})
+
+    # Written next to the final file then renamed, so a reader never sees a partial copy
+    tmp_path = cache_path(name) + f".{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, cache_path(name))
+        print(f"Dataset '{name}' converted to {cache_path(name)}")
+    except OSError as e:
+        # Read-only file system: the dashboard still works from the parsed source
+        print(f"Could not write the cached copy of '{name}': {e}")
+    return data
+
+
+# Source hashes already computed, by (path, modification time, size)
+_hashes = {}
+
+
+def version(name):
+    '''
+    Returns the version of a dataset, the hash of its source file.
+    The file is only hashed again when its modification time or size changes
+    '''
+    path = os.path.join(HERE, DATASETS[name]["source"])
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _hashes:
+        _hashes[key] = source_hash(path)
+    return _hashes[key]
+
+
+def load(name):
+    '''
+    Returns a dataset from its Parquet copy, rebuilt first if the source file changed
+    '''
+    digest = version(name)
+    if cached_hash(name) != digest:
+        return build(name, digest)
+    return pd.read_parquet(cache_path(name))
+
+
+if __name__ == "__main__":
+    for name in DATASETS:
+        load(name)
@@ -0,0 +1,115 @@
+"""
+Derived tables of the "GetAround Analysis" page.
+
+They are computed on the first visit of the page and memoized by dataset version,
+so the other pages and the following reruns cost nothing.
+"""
+import functools
+from types import SimpleNamespace
+
+import numpy as np
+
+import data_cache
+
+
+# Columns of a rental (_x) and of its following rental (_y) that the analysis never uses
+UNUSED_LINK_COLUMNS = ['state_x', 'previous_ended_rental_id_y', 'previous_ended_rental_id_x', 'time_delta_with_previous_rental_in_minutes_x', 'car_id_y', 'delay_at_checkout_in_minutes_y']
+
+
+def label_lateness(data_delay):
+    '''
+    Returns the rentals with a known checkout delay, with a "delay" column set to "late" or "not late"
+    '''
+    labelled = data_delay.dropna(subset=["delay_at_checkout_in_minutes"])
+    labelled["delay"] = np.where(labelled["delay_at_checkout_in_minutes"] > 0, "late", "not late")
+    return labelled
+
+
+def link_previous_rentals(data_delay):
+    '''
+    Returns each rental (_y) next to its previous rental (_x), for the rentals whose previous rental is in the dataset
+    '''
+    following = data_delay.dropna(subset=["previous_ended_rental_id"])
+    # The inner merge only keeps the previous rentals that are followed by another one
+    linked = data_delay.merge(following, how='inner', left_on='rental_id', right_on='previous_ended_rental_id')
+    return linked.drop(columns=UNUSED_LINK_COLUMNS)
+
+
+def compute_analysis(data_delay, data_pricing):
+    '''
+    Returns the figures and DataFrames shown on the analysis page
+    '''
+    # Findind number of unique cars
+    number_of_cars = len(data_delay['car_id'].unique())
+
+    # Finding average rental price
+    car_average_rental_price_per_day = round(data_pricing["rental_price_per_day"].mean())
+
+    # Finding number of rentals
+    number_of_rentals = data_delay.shape[0]
+
+    # Removing NaN values about late checkout from the dataset and categorizing lateness
+    data_delay_without_nan = label_lateness(data_delay)
+
+    print (f"There are {data_delay_without_nan.shape[0]} rentals in the dataset 'data_delay_without_nan'")
+
+    # Creating a new DataFrame with values counts for the lateness category
+    new_df = (data_delay_without_nan['delay'].value_counts(normalize=True)*100).rename_axis('delay').reset_index(name='counts')
+
+    # Creating a new DataFrame with values counts for the state category
+    df_rental_state = (data_delay['state'].value_counts(normalize=True)*100).rename_axis('state').reset_index(name='counts')
+
+    # Merging each rental with its previous rental to see if the previous one was late or not
+    df_merged = link_previous_rentals(data_delay)
+    print (f"After cleaning the dataset, there are {df_merged.shape[0]} rows left to use from {len(data_delay)} rows originally.")
+
+    # Creating a new DataFrame when checkout was late
+    df_merged_and_late = df_merged[df_merged["delay_at_checkout_in_minutes_x"] > 0].copy()
+
+    # Creating a new DataFrame when checkout was done on time
+    df_merged_and_not_late = df_merged[df_merged["delay_at_checkout_in_minutes_x"] <= 0]
+
+    # Creating a new DataFrame with values counts of state for late checkout
+    df_merged_and_late_value_counts = (df_merged_and_late['state_y'].value_counts(normalize=True)*100).rename_axis('state_y').reset_index(name='counts')
+
+    # Creating a new DataFrame with values counts of state for checkout on time
+    df_merged_and_not_late_value_counts = (df_merged_and_not_late['state_y'].value_counts(normalize=True)*100).rename_axis('state_y').reset_index(name='counts')
+
+    # Creating a new column to find if the checkout of the previous rental happened after the start of the following rental
+    df_merged_and_late["wait_time_in_minutes"] = df_merged_and_late["delay_at_checkout_in_minutes_x"] - df_merged_and_late["time_delta_with_previous_rental_in_minutes_y"]
+
+    # Keeping only cases when the checkout of the previous rental happened after the start of the following rental
+    df_merged_way_too_late = df_merged_and_late[df_merged_and_late["wait_time_in_minutes"] > 0]
+
+    # Creating a new DataFrame with values counts of state when the checkout of the previous rental happened after the start of the following rental
+    df_merged_way_too_late2 = (df_merged_way_too_late['state_y'].value_counts(normalize=True)*100).rename_axis('state_y').reset_index(name='counts')
+
+    # Checking if there is a difference in cancelation rate between mobile and connect checking type
+    df_merged_and_late_mobile = df_merged_and_late[df_merged_and_late["checkin_type_x"] == "mobile"]
+    df_merged_and_late_connect = df_merged_and_late[df_merged_and_late["checkin_type_x"] == "connect"]
+
+    return SimpleNamespace(
+        number_of_cars=number_of_cars,
+        car_average_rental_price_per_day=car_average_rental_price_per_day,
+        number_of_rentals=number_of_rentals,
+        new_df=new_df,
+        df_rental_state=df_rental_state,
+        df_merged_and_late_value_counts=df_merged_and_late_value_counts,
+        df_merged_and_not_late_value_counts=df_merged_and_not_late_value_counts,
+        df_merged_way_too_late=df_merged_way_too_late,
+        df_merged_way_too_late2=df_merged_way_too_late2,
+        df_merged_and_late_mobile=df_merged_and_late_mobile,
+        df_merged_and_late_connect=df_merged_and_late_connect,
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _analysis(delay_version, pricing_version):
+    return compute_analysis(data_cache.load("delay"), data_cache.load("pricing"))
+
+
+def get_analysis():
+    '''
+    Returns the analysis of the current datasets, computed once per version of the datasets
+    '''
+    return _analysis(data_cache.version("delay"), data_cache.version("pricing"))
@@ -0,0 +1,202 @@
+"""
+Index of the rental chains of each car, to follow how a late checkout cascades.
+
+Consecutive rentals of a car are linked by previous_ended_rental_id. The index stores,
+for every rental, the position of its previous rental and of the ended rental that
+follows it as integer arrays, so a cascade is followed in O(chain length) without
+any self-merge. Canceled rentals never have a following rental: they are kept as
+followers of the rental before them, where the chain may have been cut short.
+
+A driver waits max(0, delay of the previous checkout - time delta between the rentals).
+"""
+import functools
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+import data_cache
+
+
+class RentalChainIndex:
+    """
+    Per-car chains of consecutive rentals, with predecessor and successor pointers
+    """
+
+    def __init__(self, data_delay):
+        data = data_delay.sort_values("rental_id")
+        self.rental_id = data["rental_id"].to_numpy()
+        self.car_id = data["car_id"].to_numpy()
+        self.ended = (data["state"] == "ended").to_numpy()
+        self.delay = data["delay_at_checkout_in_minutes"].to_numpy(dtype=float)
+        self.time_delta = data["time_delta_with_previous_rental_in_minutes"].to_numpy(dtype=float)
+        self.checkin_type = data["checkin_type"].to_numpy()
+        n = len(self.rental_id)
+
+        # Position of the previous rental, -1 when it is unknown
+        previous_id = data["previous_ended_rental_id"].to_numpy(dtype=float)
+        known = ~np.isnan(previous_id)
+        positions = np.searchsorted(self.rental_id, previous_id[known].astype(self.rental_id.dtype))
+        positions = np.minimum(positions, n - 1)
+        found = self.rental_id[positions] == previous_id[known].astype(self.rental_id.dtype)
+        self.pred = np.full(n, -1)
+        self.pred[np.flatnonzero(known)[found]] = positions[found]
+
+        # Position of the ended rental that follows, -1 when there is none
+        self.succ = np.full(n, -1)
+        following = np.flatnonzero((self.pred >= 0) & self.ended)
+        self.succ[self.pred[following]] = following
+
+        # All the rentals that follow a rental (canceled ones included), as CSR arrays
+        linked = np.flatnonzero(self.pred >= 0)
+        order = linked[np.argsort(self.pred[linked], kind="stable")]
+        self.followers = order
+        self.followers_start = np.searchsorted(self.pred[order], np.arange(n + 1))
+
+        # Time the driver of each rental waited for the car, NaN when the previous checkout delay is unknown
+        self.wait = np.full(n, np.nan)
+        self.wait[linked] = np.maximum(0, self.delay[self.pred[linked]] - self.time_delta[linked])
+
+        self._build_chains()
+        # Computed on the first call of cascades()
+        self._cascades = None
+
+    def _build_chains(self):
+        '''
+        Concatenates the chains, sorted by car then by first rental, into one array with offsets
+        '''
+        heads = np.flatnonzero((self.pred < 0) & (self.succ >= 0))
+        heads = heads[np.lexsort((self.rental_id[heads], self.car_id[heads]))]
+
+        chains, offsets = [], [0]
+        for head in heads:
+            position = head
+            while position >= 0:
+                chains.append(position)
+                position = self.succ[position]
+            offsets.append(len(chains))
+
+        self.chains = np.array(chains, dtype=int)
+        self.chain_offsets = np.array(offsets, dtype=int)
+        self.chain_car_id = self.car_id[heads]
+
+        # Chain of each rental, -1 when the rental is alone
+        self.chain_of = np.full(len(self.rental_id), -1)
+        self.chain_of[self.chains] = np.repeat(np.arange(len(heads)), np.diff(self.chain_offsets))
+
+    def __len__(self):
+        return len(self.chain_car_id)
+
+    def position(self, rental_id):
+        position = int(np.searchsorted(self.rental_id, rental_id))
+        if position >= len(self.rental_id) or self.rental_id[position] != rental_id:
+            raise KeyError(f"Unknown rental {rental_id}")
+        return position
+
+    def chain(self, rental_id):
+        '''
+        Returns the rental ids of the chain of a rental, in order
+        '''
+        chain = self.chain_of[self.position(rental_id)]
+        if chain < 0:
+            return np.array([rental_id])
+        return self.rental_id[self.chains[self.chain_offsets[chain]:self.chain_offsets[chain + 1]]]
+
+    def chain_lengths(self):
+        return np.diff(self.chain_offsets)
+
+    def _followers(self, position):
+        return self.followers[self.followers_start[position]:self.followers_start[position + 1]]
+
+    def cascade(self, rental_id):
+        '''
+        Follows the delay of a rental along its chain, as long as the next driver had to wait.
+        Returns the rentals reached, the wait of each one, the depth and the cumulative wait
+        '''
+        position = self.position(rental_id)
+        rentals, waits, canceled = [], [], []
+        while True:
+            # Canceled followers whose driver had to wait end the cascade on their branch
+            for follower in self._followers(position):
+                if not self.ended[follower] and self.wait[follower] > 0:
+                    canceled.append(int(self.rental_id[follower]))
+            following = self.succ[position]
+            if following < 0 or not self.wait[following] > 0:
+                break
+            rentals.append(int(self.rental_id[following]))
+            waits.append(float(self.wait[following]))
+            position = following
+
+        return SimpleNamespace(
+            rental_id=rental_id,
+            rentals=rentals,
+            waits=waits,
+            depth=len(rentals),
+            cumulative_wait=float(sum(waits)),
+            canceled=canceled,
+        )
+
+    def cascades(self):
+        '''
+        Returns every cascade started by a late checkout whose own driver did not wait,
+        with its depth (following rentals that waited), its cumulative wait and its canceled rentals.
+        Computed once per index, each caller gets its own copy
+        '''
+        if self._cascades is None:
+            self._cascades = self._find_cascades()
+        return self._cascades.copy()
+
+    def _find_cascades(self):
+        # Only the rentals followed by another one can start a cascade
+        has_followers = np.diff(self.followers_start) > 0
+        origins = np.flatnonzero(has_followers & self.ended & (self.delay > 0) & ~(self.wait > 0))
+        rows = []
+        for position in origins:
+            cascade = self.cascade(self.rental_id[position])
+            if cascade.depth or cascade.canceled:
+                rows.append({
+                    "rental_id": cascade.rental_id,
+                    "car_id": self.car_id[position],
+                    "checkin_type": self.checkin_type[position],
+                    "delay_at_checkout_in_minutes": self.delay[position],
+                    "depth": cascade.depth,
+                    "cumulative_wait_in_minutes": cascade.cumulative_wait,
+                    "canceled": len(cascade.canceled),
+                })
+        return pd.DataFrame(rows, columns=["rental_id", "car_id", "checkin_type", "delay_at_checkout_in_minutes", "depth", "cumulative_wait_in_minutes", "canceled"])
+
+    def chain_frame(self, rental_id):
+        '''
+        Returns the rentals of the chain of a rental, followers included, with the wait of each driver
+        '''
+        chain = self.chain_of[self.position(rental_id)]
+        if chain < 0:
+            chain_positions = [self.position(rental_id)]
+        else:
+            chain_positions = self.chains[self.chain_offsets[chain]:self.chain_offsets[chain + 1]]
+
+        positions = []
+        for position in chain_positions:
+            positions.append(position)
+            positions.extend(f for f in self._followers(position) if not self.ended[f])
+        positions = np.array(positions, dtype=int)
+        return pd.DataFrame({
+            "rental_id": self.rental_id[positions],
+            "state": np.where(self.ended[positions], "ended", "canceled"),
+            "checkin_type": self.checkin_type[positions],
+            "time_delta_with_previous_rental_in_minutes": self.time_delta[positions],
+            "delay_at_checkout_in_minutes": self.delay[positions],
+            "wait_in_minutes": self.wait[positions],
+        })
+
+
+@functools.lru_cache(maxsize=4)
+def _chain_index(delay_version):
+    return RentalChainIndex(data_cache.load("delay"))
+
+
+def get_chain_index():
+    '''
+    Returns the chain index of the current delay dataset, built once per version of the dataset
+    '''
+    return _chain_index(data_cache.version("delay"))
@@ -0,0 +1,97 @@
+"""
+Scenario grid of the minimum delay decision: every threshold for every check-in scope.
+
+The scopes are evaluated in one process with the revenue model of the "Try your
+own variables" page (simulator.py), built once for all of them: the whole grid takes
+well under a second, less than starting worker processes that would each load the
+datasets and build the model again. It is written as a compact Parquet table stamped
+with the versions of the datasets. The dashboard loads it instantly and only
+rebuilds it when a dataset changed:
+
+    python scenario_grid.py --max-threshold 720
+"""
+import argparse
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import data_cache
+import simulator
+
+
+MAX_THRESHOLD = 720
+GRID_PATH = os.path.join(data_cache.CACHE_DIR, "scenario_grid.parquet")
+
+# Key of the dataset versions in the Parquet metadata
+VERSION_KEY = b"dataset_versions"
+
+# Columns of the grid and their compact types
+COLUMNS = {
+    "checkin_type": "category",
+    "threshold": "int16",
+    "money_lost": "int64",
+    "money_saved": "int64",
+    "ended_lost": "int32",
+    "lost_rate": "float32",
+    "rentals_lost": "int32",
+    "cancelation_prevented": "int32",
+    "rate_cancelation_prevented": "float32",
+}
+
+
+def dataset_versions():
+    return f"{data_cache.version('delay')}:{data_cache.version('pricing')}"
+
+
+def evaluate_scope(scope, max_threshold):
+    '''
+    Returns the figures of every threshold from 0 to `max_threshold` minutes for one scope
+    '''
+    curve = simulator.get_simulator().curve(scope, 0, max_threshold)
+    return curve[list(COLUMNS)]
+
+
+def build_grid(max_threshold=MAX_THRESHOLD):
+    '''
+    Evaluates every scope with the simulator of the current process and returns the grid
+    '''
+    curves = [evaluate_scope(scope, max_threshold) for scope in simulator.SCOPES]
+    return pd.concat(curves, ignore_index=True).astype(COLUMNS)
+
+
+def write_grid(grid, path=GRID_PATH):
+    table = pa.Table.from_pandas(grid, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), VERSION_KEY: dataset_versions().encode()})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + f".{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    print(f"Scenario grid of {len(grid)} rows written to {path}")
+
+
+def load_grid(path=GRID_PATH, max_threshold=MAX_THRESHOLD):
+    '''
+    Returns the scenario grid, rebuilt first when it is missing or was built on other datasets
+    '''
+    if os.path.exists(path):
+        metadata = pq.read_schema(path).metadata or {}
+        if metadata.get(VERSION_KEY, b"").decode() == dataset_versions():
+            return pd.read_parquet(path)
+
+    grid = build_grid(max_threshold)
+    try:
+        write_grid(grid, path)
+    except OSError as e:
+        print(f"Could not write the scenario grid: {e}")
+    return grid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-threshold", type=int, default=MAX_THRESHOLD, help="Last threshold of the grid, in minutes")
+    parser.add_argument("--output", default=GRID_PATH)
+    args = parser.parse_args()
+
+    write_grid(build_grid(args.max_threshold), args.output)
@@ -0,0 +1,148 @@
+"""
+Simulator of the minimum delay between two rentals.
+
+Only the threshold comparison depends on the chosen minimum delay, so for each
+check-in scope the simulator sorts once the time deltas of the ended rentals and
+the waits of the canceled rentals. Any threshold is then answered with
+np.searchsorted, and the whole 0-500 minutes curve in one call.
+"""
+import functools
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+import data_cache
+from delay_analysis import link_previous_rentals
+
+
+SCOPES = ("connect", "mobile", "both")
+
+
+class MinimumDelaySimulator:
+    """
+    Money lost and saved by a minimum delay between rentals, for each check-in scope.
+
+    Gives the same figures as the step by step computation of the
+    "Try your own variables" page.
+    """
+
+    def __init__(self, data_delay, car_average_rental_price_per_day):
+        self.car_average_rental_price_per_day = car_average_rental_price_per_day
+
+        # Each rental next to its previous rental (_x), when the previous rental is known
+        linked = link_previous_rentals(data_delay)
+
+        # Curves already computed, by (scope, start, stop)
+        self._curves = {}
+
+        self._scopes = {}
+        for scope in SCOPES:
+            if scope == "both":
+                scope_linked, scope_rentals = linked, data_delay
+            else:
+                scope_linked = linked[linked["checkin_type_x"] == scope]
+                scope_rentals = data_delay[data_delay["checkin_type"] == scope]
+            self._scopes[scope] = self._precompute(scope_linked, scope_rentals)
+
+    @staticmethod
+    def _precompute(linked, rentals):
+        ended = linked[linked["state_y"] == "ended"]
+        canceled = linked[linked["state_y"] == "canceled"]
+
+        # How long the next driver waited, for the canceled rentals following a late checkout
+        late = canceled[canceled["delay_at_checkout_in_minutes_x"] > 0]
+        wait = (late["delay_at_checkout_in_minutes_x"] - late["time_delta_with_previous_rental_in_minutes_y"]).to_numpy()
+
+        time_delta = ended["time_delta_with_previous_rental_in_minutes_y"].to_numpy()
+        return SimpleNamespace(
+            rentals=len(rentals),
+            all_ended=int((rentals["state"] == "ended").sum()),
+            linked_rentals=len(linked),
+            ended=len(ended),
+            canceled=len(canceled),
+            # Missing time deltas are never kept, they are left out of the sorted array
+            ended_time_delta=np.sort(time_delta[~np.isnan(time_delta)]),
+            canceled_wait=np.sort(wait[wait > 0]),
+        )
+
+    def _figures(self, scope, threshold, ended_kept, canceled_prevented):
+        '''
+        Money lost and saved from the counts of a threshold, rounded like the dashboard always did
+        '''
+        s = self._scopes[scope]
+        price = self.car_average_rental_price_per_day
+
+        lost = s.ended - ended_kept
+        lost_rate = round(lost / s.ended * 100, 2)
+        rentals_lost = round(lost_rate * s.all_ended / 100)
+
+        canceled_late = len(s.canceled_wait)
+        rate_too_late_canceled_case = canceled_late * 100 / s.linked_rentals
+        rate_cancelation_prevented = canceled_prevented * 100 / canceled_late
+        total_estimated_cancelation_prevented = s.rentals * (rate_too_late_canceled_case / 100)
+
+        return SimpleNamespace(
+            checkin_type=scope,
+            threshold=threshold,
+            rentals=s.rentals,
+            linked_rentals=s.linked_rentals,
+            ended=s.ended,
+            ended_kept=ended_kept,
+            ended_lost=lost,
+            lost_rate=lost_rate,
+            all_ended=s.all_ended,
+            rentals_lost=rentals_lost,
+            money_lost=rentals_lost * price,
+            canceled=s.canceled,
+            canceled_late=canceled_late,
+            canceled_late_left=canceled_late - canceled_prevented,
+            cancelation_prevented=canceled_prevented,
+            rate_cancelation_prevented=rate_cancelation_prevented,
+            total_estimated_cancelation_prevented=total_estimated_cancelation_prevented,
+            money_saved=round(total_estimated_cancelation_prevented * (rate_cancelation_prevented / 100) * price),
+        )
+
+    def simulate(self, checkin_type, threshold):
+        '''
+        Returns the figures of a minimum delay of `threshold` minutes on a check-in scope
+        '''
+        s = self._scopes[checkin_type]
+        # Ended rentals with a time delta of at least the threshold are kept
+        ended_kept = len(s.ended_time_delta) - int(np.searchsorted(s.ended_time_delta, threshold, side='left'))
+        # Canceled rentals whose next driver waited at most the threshold are prevented
+        canceled_prevented = int(np.searchsorted(s.canceled_wait, threshold, side='right'))
+        return self._figures(checkin_type, threshold, ended_kept, canceled_prevented)
+
+    def curve(self, checkin_type, start=0, stop=500):
+        '''
+        Returns money lost and saved for every threshold from `start` to `stop` minutes.
+        Computed once per simulator, each caller gets its own copy
+        '''
+        key = (checkin_type, start, stop)
+        if key not in self._curves:
+            self._curves[key] = self._curve(checkin_type, start, stop)
+        return self._curves[key].copy()
+
+    def _curve(self, checkin_type, start, stop):
+        s = self._scopes[checkin_type]
+        thresholds = np.arange(start, stop + 1)
+        ended_kept = len(s.ended_time_delta) - np.searchsorted(s.ended_time_delta, thresholds, side='left')
+        canceled_prevented = np.searchsorted(s.canceled_wait, thresholds, side='right')
+
+        rows = [vars(self._figures(checkin_type, int(t), int(kept), int(prevented)))
+                for t, kept, prevented in zip(thresholds, ended_kept, canceled_prevented)]
+        return pd.DataFrame(rows)
+
+
+@functools.lru_cache(maxsize=4)
+def _simulator(delay_version, pricing_version):
+    data_pricing = data_cache.load("pricing")
+    return MinimumDelaySimulator(data_cache.load("delay"), round(data_pricing["rental_price_per_day"].mean()))
+
+
+def get_simulator():
+    '''
+    Returns the simulator of the current datasets, built once per version of the datasets
+    '''
+    return _simulator(data_cache.version("delay"), data_cache.version("pricing"))
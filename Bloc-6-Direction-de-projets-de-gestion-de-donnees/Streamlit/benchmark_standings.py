@@ -0,0 +1,141 @@
+"""
+Benchmark of the standings reshaping of the season page, legacy loops against standings.py.
+
+The 2022 standings of the local mirror are measured first, then synthetic standings of
+many seasons (races x drivers, cumulated random points):
+
+    python benchmark_standings.py --sizes 22x21 220x50 440x200 --output standings_benchmark.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_access
+from standings import INFO_COLUMNS, champ_pos_frame, color_map
+
+
+def synthetic_standings(races, drivers, seed=0):
+    '''
+    Returns wide standings of `drivers` drivers over `races` rounds, and their driver info
+    '''
+    rng = np.random.default_rng(seed)
+    abbreviations = [f"D{i:03d}" for i in range(drivers)]
+    points = rng.choice([0, 0, 1, 2, 4, 6, 8, 10, 12, 15, 18, 25], size=(drivers, races)).cumsum(axis=1)
+    drivers_standings = pd.DataFrame(points, index=abbreviations, columns=[str(i) for i in range(1, races + 1)])
+    drivers_info = pd.DataFrame({
+        'DriverNumber': range(drivers),
+        'BroadcastName': abbreviations,
+        'Abbreviation': abbreviations,
+        'TeamName': [f"Team {i // 2}" for i in range(drivers)],
+        'TeamColor': [f"{(i * 7919) % 0xFFFFFF:06x}" for i in range(drivers)],
+        'FirstName': abbreviations,
+        'LastName': abbreviations,
+        'FullName': abbreviations,
+    })
+    return drivers_standings, drivers_info
+
+
+def legacy_champ_pos(drv, drivers_info):
+    '''
+    The reshaping as plot_champ_pos used to do it, with a concat per race and a row-wise ranking loop
+    '''
+    df_class = drivers_info.merge(drv, how='right', left_on = ['Abbreviation'], right_index = True).reset_index()
+
+    nb = len(drv.transpose())+1
+    df_final = pd.DataFrame(columns=INFO_COLUMNS + ['Points', 'Race'])
+    for i in range(1,nb):
+        df_class_ligne = df_class.loc[:,INFO_COLUMNS + [str(i)]]
+        df_class_ligne['Race'] = i
+        df_class_ligne.rename(columns={str(i): 'Points'}, inplace = True)
+        df_final = pd.concat([df_final, df_class_ligne])
+    df_final.reset_index(drop = True, inplace = True)
+
+    df_final = df_final.sort_values(by=['Race', 'Points'], ascending = [True, False])
+    df_final['classement']=len(drv)
+    longueur = len(df_final)
+    df_final.iloc[0,10] = 1
+
+    for i in range(1,longueur -1):
+        if df_final.iloc[i,9] == df_final.iloc[i-1,9]:
+            df_final.iloc[i,10] = df_final.iloc[i-1,10] +  1
+        else :
+            df_final.iloc[i,10] = 1
+
+    df_init = df_final[df_final['Race']==nb-1].copy()
+    df_init['Race'] = 0
+    df_init['Points'] = 0
+
+    df_final = pd.concat([df_final, df_init])
+
+    colorMap ={}
+    df_class = pd.DataFrame(df_class)
+    for i in df_class.itertuples() :
+        if type(i.TeamColor) != str:
+            colorMap[i.Abbreviation] = '#FFFFFF'
+        else:
+            colorMap[i.Abbreviation] = '#' + i.TeamColor
+
+    df_final = df_final.sort_values(by=['Race', 'classement'], ascending = [True, True])
+    return df_final, colorMap
+
+
+def vectorized_champ_pos(drv, drivers_info):
+    return champ_pos_frame(drv, drivers_info), color_map(drv, drivers_info)
+
+
+def comparable(frame):
+    frame = frame[['Race', 'Abbreviation', 'Points', 'classement']].reset_index(drop=True)
+    return frame.astype({'Race': int, 'Abbreviation': str, 'Points': int, 'classement': int})
+
+
+def best_time(function, data, repeat):
+    '''
+    Returns the best of `repeat` runs, in seconds, and the result of the last one
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*data)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", default=["22x21", "220x50", "440x200"], help="Synthetic standings, races x drivers")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    datasets = [("2022", (data_access.read_csv('drivers_standings.csv', index_col=0), pd.read_csv('drivers_info.csv', index_col=0)))]
+    for size in args.sizes:
+        races, drivers = (int(n) for n in size.split("x"))
+        datasets.append((f"synthetic {size}", synthetic_standings(races, drivers)))
+
+    results = []
+    for name, data in datasets:
+        legacy_seconds, legacy = best_time(legacy_champ_pos, data, args.repeat)
+        vectorized_seconds, vectorized = best_time(vectorized_champ_pos, data, args.repeat)
+
+        # Both versions must give the same positions and colors
+        same = comparable(legacy[0]).equals(comparable(vectorized[0])) and legacy[1] == vectorized[1]
+
+        result = {
+            "standings": name,
+            "races": data[0].shape[1],
+            "drivers": data[0].shape[0],
+            "rows": len(vectorized[0]),
+            "legacy_seconds": round(legacy_seconds, 4),
+            "vectorized_seconds": round(vectorized_seconds, 4),
+            "speedup": round(legacy_seconds / vectorized_seconds, 1),
+            "same_result": same,
+        }
+        print(json.dumps(result))
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,161 @@
+"""
+Local mirror of the F1 datasets hosted on S3.
+
+The pages read the standings, tyre life, predicted strategies and start line files
+from a local folder (F1_DATA_DIR, the data/ folder of the project by default).
+When a file was not checked for F1_DATA_REVALIDATE_SECONDS, a background thread
+revalidates it against the bucket with If-None-Match / If-Modified-Since and only
+downloads it when it changed. When the bucket cannot be reached the mirror is
+served as is, so rendering never waits on the network. Only a file missing from
+the mirror is downloaded on the request path.
+
+The Docker image fills the mirror with every dataset of the pages when it is built:
+
+    python data_access.py
+"""
+import functools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("F1_DATA_DIR", os.path.join(HERE, "..", "data"))
+BASE_URL = os.environ.get("F1_DATA_URL", "https://f1-jedha-bucket.s3.eu-west-3.amazonaws.com/data/")
+REVALIDATE_SECONDS = float(os.environ.get("F1_DATA_REVALIDATE_SECONDS", 300))
+TIMEOUT = 10
+
+# Validators (ETag, Last-Modified) and time of the last check of each file
+METADATA_FILE = ".mirror.json"
+
+# Datasets read by the pages, one tyre life and predicted strategy file per round
+ROUNDS = range(1, 9)
+DATASETS = ['drivers_standings.csv', 'constructors_standings.csv', 'start_line_dict.json'] \
+    + [f'tyre_life_data_{gp_round}.csv' for gp_round in ROUNDS] \
+    + [f'predicted_strategy_round_{gp_round}.csv' for gp_round in ROUNDS]
+
+_lock = threading.Lock()
+_in_flight = set()
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="f1-data-revalidation")
+
+
+def _metadata_path():
+    return os.path.join(DATA_DIR, METADATA_FILE)
+
+
+def _load_metadata():
+    try:
+        with open(_metadata_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+_metadata = _load_metadata()
+
+
+def _save_metadata():
+    tmp_path = _metadata_path() + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(_metadata, f, indent=2)
+    os.replace(tmp_path, _metadata_path())
+
+
+def fetch(name):
+    '''
+    Revalidates one file of the mirror against the bucket, returns True when it was downloaded again
+    '''
+    with _lock:
+        validators = dict(_metadata.get(name, {}))
+
+    local_path = os.path.join(DATA_DIR, name)
+    headers = {}
+    if os.path.exists(local_path):
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    response = requests.get(BASE_URL + name, headers=headers, timeout=TIMEOUT)
+    updated = False
+    if response.status_code == 200:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        tmp_path = f"{local_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp_path, local_path)
+        validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        updated = True
+    elif response.status_code != 304:
+        response.raise_for_status()
+
+    with _lock:
+        _metadata[name] = dict(validators, checked_at=time.time())
+        _save_metadata()
+    return updated
+
+
+def _revalidate(name):
+    try:
+        if fetch(name):
+            print(f"{name} updated from {BASE_URL}")
+    except (requests.RequestException, OSError) as e:
+        # Offline or bucket unavailable: the mirror keeps being served
+        print(f"Could not revalidate {name}, serving the local copy: {e}")
+        # Tried again after REVALIDATE_SECONDS, not on every read
+        with _lock:
+            _metadata.setdefault(name, {})["checked_at"] = time.time()
+    finally:
+        with _lock:
+            _in_flight.discard(name)
+
+
+def path(name):
+    '''
+    Returns the local path of a dataset, scheduling its revalidation in the background when it is due
+    '''
+    local_path = os.path.join(DATA_DIR, name)
+    if not os.path.exists(local_path):
+        # Nothing to serve yet, the first download happens on the request path
+        try:
+            fetch(name)
+        except requests.RequestException as e:
+            raise FileNotFoundError(f"{name} is not in the local mirror {DATA_DIR} and could not be downloaded from {BASE_URL}: {e}") from e
+        return local_path
+
+    with _lock:
+        due = time.time() - _metadata.get(name, {}).get("checked_at", 0) > REVALIDATE_SECONDS
+        if due and name not in _in_flight:
+            _in_flight.add(name)
+            _executor.submit(_revalidate, name)
+    return local_path
+
+
+@functools.lru_cache(maxsize=64)
+def _read_csv(local_path, mtime_ns, index_col):
+    return pd.read_csv(local_path, index_col=index_col)
+
+
+def read_csv(name, index_col=None):
+    '''
+    Returns a dataset of the mirror as a DataFrame, parsed again only when the file changed
+    '''
+    local_path = path(name)
+    # A copy, the pages are free to change it
+    return _read_csv(local_path, os.stat(local_path).st_mtime_ns, index_col).copy()
+
+
+def read_json(name):
+    with open(path(name)) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    # Downloads the datasets missing from the mirror and the ones changed on the bucket
+    for name in DATASETS:
+        print(f"{name} {'downloaded' if fetch(name) else 'up to date'}")
@@ -0,0 +1,125 @@
+"""
+Delta times between every pair of drivers of a session.
+
+The car data of each driver's fastest lap is resampled once onto a distance grid
+common to the session (one point every GRID_STEP meters): the elapsed time of each
+driver at each point, as float32. The delta time of any pair of drivers is then the
+difference of two columns, and the gap at the end of the grid between all drivers
+is a matrix. Both are written next to the session artifacts:
+
+    delta_grid.parquet     Distance and one column of elapsed times per driver
+    delta_matrix.parquet   gap of each driver (column) to each reference driver (row)
+
+Drivers with fewer than 2 car data samples cannot be interpolated and are left out;
+a session without any usable car data has no files, and the pages compute the delta
+of a pair of drivers on the fly. The ingestion job writes them with the other
+artifacts. For the sessions ingested before, they are built in parallel worker processes:
+
+    python delta_matrix.py --year 2022 --workers 4
+"""
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from session_artifacts import ARTIFACTS_DIR
+
+
+GRID_STEP = 1.0
+GRID_FILE = "delta_grid.parquet"
+MATRIX_FILE = "delta_matrix.parquet"
+
+
+def elapsed_times(car_data, grid):
+    '''
+    Returns the elapsed time of a lap at each distance of the grid, interpolated as fastf1.utils.delta_time does
+    '''
+    def extend(stream):
+        # One extrapolated sample at each end, so every distance of the grid is interpolated
+        return np.concatenate([[stream[0] - (stream[1] - stream[0])], stream, [stream[-1] + (stream[-1] - stream[-2])]])
+
+    time = extend(car_data['Time'].to_numpy(dtype=float))
+    distance = extend(car_data['Distance'].to_numpy(dtype=float))
+    return np.interp(grid, distance, time).astype('float32')
+
+
+def build_delta_grid(car_data, step=GRID_STEP):
+    '''
+    Returns the elapsed times of every driver on a common distance grid, from the car data of each driver.
+    Drivers with fewer than 2 samples are left out, None when no driver is left
+    '''
+    car_data = {driver: data for driver, data in car_data.items() if len(data) >= 2}
+    if not car_data:
+        return None
+
+    # Up to the shortest lap, so no driver is extrapolated at the end of the grid
+    length = min(float(data['Distance'].iloc[-1]) for data in car_data.values())
+    grid = np.arange(0, length, step, dtype='float32')
+    columns = {'Distance': grid}
+    for driver, data in car_data.items():
+        columns[driver] = elapsed_times(data, grid)
+    return pd.DataFrame(columns)
+
+
+def gap_matrix(delta_grid):
+    '''
+    Returns the gap of each driver (column) to each reference driver (row) at the end of the grid, in seconds
+    '''
+    final_times = delta_grid.drop(columns='Distance').iloc[-1]
+    times = final_times.to_numpy(dtype='float32')
+    return pd.DataFrame(times[None, :] - times[:, None], index=final_times.index, columns=final_times.index)
+
+
+def write_delta_matrix(path, step=GRID_STEP):
+    '''
+    Builds the delta grid and gap matrix of the session artifacts in `path` from their car data, and writes them there.
+    Returns None, writing nothing, when the session has no usable car data
+    '''
+    car_data = {}
+    for file in sorted(glob.glob(os.path.join(path, "car_data", "*.parquet"))):
+        driver = os.path.splitext(os.path.basename(file))[0]
+        car_data[driver] = pd.read_parquet(file, columns=['Time', 'Distance'])
+
+    delta_grid = build_delta_grid(car_data, step)
+    if delta_grid is None:
+        print(f"No usable car data in {path}, no delta matrix written")
+        return None
+    for name, frame in [(GRID_FILE, delta_grid), (MATRIX_FILE, gap_matrix(delta_grid))]:
+        tmp_path = os.path.join(path, f"{name}.{os.getpid()}.tmp")
+        frame.to_parquet(tmp_path)
+        os.replace(tmp_path, os.path.join(path, name))
+    return path
+
+
+def sessions_without_matrix(year, root=None, force=False):
+    '''
+    Returns the folders of the ingested sessions of a season without a delta matrix
+    '''
+    folders = glob.glob(os.path.join(root or ARTIFACTS_DIR, str(year), "*", "*", "session.json"))
+    folders = sorted(os.path.dirname(folder) for folder in folders)
+    return [folder for folder in folders if force or not os.path.exists(os.path.join(folder, MATRIX_FILE))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--year", type=int, default=2022)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--root", default=ARTIFACTS_DIR)
+    parser.add_argument("--step", type=float, default=GRID_STEP, help="Distance between two points of the grid, in meters")
+    parser.add_argument("--force", action="store_true", help="Build again the matrices already written")
+    args = parser.parse_args()
+
+    folders = sessions_without_matrix(args.year, args.root, args.force)
+    print(f"{len(folders)} sessions to process")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(write_delta_matrix, folder, args.step): folder for folder in folders}
+        for future in as_completed(futures):
+            try:
+                if future.result() is not None:
+                    print(f"{futures[future]} done")
+            except Exception as e:
+                print(f"{futures[future]} failed: {e}")
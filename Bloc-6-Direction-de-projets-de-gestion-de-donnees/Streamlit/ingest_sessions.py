@@ -0,0 +1,188 @@
+"""
+Offline ingestion of the F1 sessions into compact artifacts read by the dashboard.
+
+For every session of every round already run, the FastF1 session is loaded once and
+its laps, results, fastest laps, the car data and telemetry of each driver's
+fastest lap and the delta times between all drivers are written as Parquet files
+(see session_artifacts.py and delta_matrix.py). Rounds are processed in parallel
+worker processes:
+
+    python ingest_sessions.py --year 2022 --workers 4
+    python ingest_sessions.py --year 2022 --rounds 7 8 --force
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fastf1 as ff1
+from fastf1.core import Laps
+import pandas as pd
+
+from delta_matrix import write_delta_matrix
+from session_artifacts import ARTIFACTS_DIR, HERE, is_ingested, session_dir
+
+
+FASTF1_CACHE = os.path.join(HERE, "cache")
+
+# Channels kept for each driver's fastest lap, stored as float32 except the gear and the brake
+CAR_DATA_CHANNELS = ['Time', 'Distance', 'Speed', 'RPM', 'nGear', 'Throttle', 'Brake', 'DRS']
+TELEMETRY_CHANNELS = ['Time', 'Distance', 'X', 'Y', 'Z', 'Speed', 'RPM', 'nGear', 'Throttle', 'Brake', 'DRS']
+
+
+def compact(data, channels):
+    '''
+    Returns the channels of a telemetry frame with compact types, Time in seconds
+    '''
+    frame = pd.DataFrame({c: data[c] for c in channels if c in data.columns})
+    if 'Time' in frame:
+        frame['Time'] = frame['Time'].dt.total_seconds()
+    for column in frame.columns:
+        if column == 'nGear':
+            frame[column] = frame[column].astype('int8')
+        elif column == 'Brake':
+            frame[column] = frame[column].astype(bool)
+        else:
+            frame[column] = frame[column].astype('float32')
+    return frame.reset_index(drop=True)
+
+
+def get_fastest_laps(session):
+    '''
+    Returns the fastest quick lap of each driver, with its delta to the pole lap
+    '''
+    quick_laps = session.laps.pick_quicklaps()
+    list_fastest_laps = [quick_laps.pick_driver(drv).pick_fastest() for drv in quick_laps['Driver'].unique()]
+    fastest_laps = Laps(list_fastest_laps).sort_values(by='LapTime').reset_index(drop=True)
+    pole_lap = fastest_laps.pick_fastest()
+    fastest_laps['LapTimeDelta'] = fastest_laps['LapTime'] - pole_lap['LapTime']
+    fastest_laps = fastest_laps.dropna(subset=['Time'])
+    return pd.DataFrame(fastest_laps[['Driver', 'Team', 'LapTime', 'LapTimeDelta', 'Time']]).reset_index(drop=True)
+
+
+def write_artifacts(session, year, gp_round, tmp):
+    '''
+    Writes the artifacts of a loaded session in the folder `tmp`, session.json last
+    '''
+    os.makedirs(os.path.join(tmp, "car_data"))
+    os.makedirs(os.path.join(tmp, "telemetry"))
+
+    pd.DataFrame(session.laps).reset_index(drop=True).to_parquet(os.path.join(tmp, "laps.parquet"))
+    pd.DataFrame(session.results).reset_index(drop=True).to_parquet(os.path.join(tmp, "results.parquet"))
+    get_fastest_laps(session).to_parquet(os.path.join(tmp, "fastest_laps.parquet"))
+
+    drivers = list(session.laps['Driver'].unique())
+    for driver in drivers:
+        fastest = session.laps.pick_driver(driver).pick_fastest()
+        if fastest.empty or pd.isna(fastest['LapTime']):
+            continue
+        # The same car data as fastf1.utils.delta_time uses
+        car_data = fastest.get_car_data(interpolate_edges=True).add_distance()
+        compact(car_data, CAR_DATA_CHANNELS).to_parquet(os.path.join(tmp, "car_data", f"{driver}.parquet"))
+        telemetry = fastest.telemetry
+        telemetry = telemetry[telemetry['Source'] != 'pos']
+        compact(telemetry, TELEMETRY_CHANNELS).to_parquet(os.path.join(tmp, "telemetry", f"{driver}.parquet"))
+
+    write_delta_matrix(tmp)
+
+    info = {
+        "year": int(year),
+        "round": int(gp_round),
+        "event_name": session.event.EventName,
+        "name": session.name,
+        "drivers": drivers,
+        "quick_drivers": list(session.laps.pick_quicklaps()['Driver'].unique()),
+    }
+    # Written last, it marks the session as complete
+    with open(os.path.join(tmp, "session.json"), "w") as f:
+        json.dump(info, f)
+
+
+def publish(tmp, target, replace=True):
+    '''
+    Moves the artifacts written in `tmp` to `target`. A complete previous ingestion is replaced
+    with `replace`, otherwise kept, as when another thread published the session meanwhile
+    '''
+    if replace or not os.path.exists(os.path.join(target, "session.json")):
+        shutil.rmtree(target, ignore_errors=True)
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        if not os.path.exists(os.path.join(target, "session.json")):
+            raise
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def ingest_session(year, gp_round, session_name, root=None, replace=True):
+    '''
+    Loads a session with FastF1 and writes its artifacts, returns their folder.
+    Without `replace`, artifacts published meanwhile by another ingestion are kept
+    '''
+    session = ff1.get_session(year, gp_round, session_name)
+    session.load(weather=False, telemetry=True, messages=False)
+
+    target = session_dir(year, gp_round, session_name, root)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # A folder of its own, the dashboard may ingest the same session from several threads at once
+    tmp = tempfile.mkdtemp(prefix=f"{os.path.basename(target)}.tmp-", dir=os.path.dirname(target))
+    try:
+        write_artifacts(session, year, gp_round, tmp)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    publish(tmp, target, replace)
+    return target
+
+
+def _ingest(year, gp_round, session_name, root):
+    ff1.Cache.enable_cache(FASTF1_CACHE)
+    ingest_session(year, gp_round, session_name, root)
+    return year, gp_round, session_name
+
+
+def sessions_to_ingest(year, rounds=None):
+    '''
+    Returns the (round, session) pairs of the events already run
+    '''
+    schedule = ff1.get_event_schedule(year, include_testing=False)
+    schedule = schedule[schedule['EventDate'] <= pd.Timestamp.now()]
+    pairs = []
+    for event in schedule.itertuples():
+        if rounds and event.RoundNumber not in rounds:
+            continue
+        for column in ['Session1', 'Session2', 'Session3', 'Session4', 'Session5']:
+            session_name = getattr(event, column)
+            if session_name:
+                pairs.append((int(event.RoundNumber), session_name))
+    return pairs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--year", type=int, default=2022)
+    parser.add_argument("--rounds", nargs="+", type=int, help="Only these rounds (default: every round already run)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default=ARTIFACTS_DIR)
+    parser.add_argument("--force", action="store_true", help="Ingest again the sessions already ingested")
+    args = parser.parse_args()
+
+    os.makedirs(FASTF1_CACHE, exist_ok=True)
+    ff1.Cache.enable_cache(FASTF1_CACHE)
+
+    pairs = [(gp_round, session_name) for gp_round, session_name in sessions_to_ingest(args.year, args.rounds)
+             if args.force or not is_ingested(args.year, gp_round, session_name, args.output)]
+    print(f"{len(pairs)} sessions to ingest")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(_ingest, args.year, gp_round, session_name, args.output): (gp_round, session_name)
+                   for gp_round, session_name in pairs}
+        for future in as_completed(futures):
+            gp_round, session_name = futures[future]
+            try:
+                future.result()
+                print(f"Round {gp_round} - {session_name} ingested")
+            except Exception as e:
+                print(f"Round {gp_round} - {session_name} failed: {e}")
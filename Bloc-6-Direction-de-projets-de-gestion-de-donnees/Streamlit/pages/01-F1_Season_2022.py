@@ -12,6 +12,9 @@ import warnings
 warnings.simplefilter(action='ignore', category=FutureWarning)
 import streamlit as st
 from PIL import Image
+import standings
+from standings_store import get_store
+from schedule import get_schedule
 
 ### Config
 st.set_page_config(
@@ -21,57 +24,20 @@ st.set_page_config(
 )
 
 # Global variables
-events_list = ff1.get_event_schedule(2022)[2:]
-country_abbrev = ['BHR','SAU','AUS','ERO','MIA','ESP','MCO','AZE','CAN','GBR','AUT','FRA','HUN','BEL','NLD','ITA','SGP','JPN','USA','MXC','SAO','ABD']
-events_list['CountryAbbreviation'] = country_abbrev
+season = 2022
+schedule = get_schedule(season)
 
 # Functions
 @st.cache()
-def plot_champ_pos():
+def plot_champ_pos(season, last_round):
     '''
-    Plots the evolution of the drivers standings
+    Plots the evolution of the drivers standings, built again only when a round is added
     '''
-    drv = pd.read_csv('https://f1-jedha-bucket.s3.eu-west-3.amazonaws.com/data/drivers_standings.csv', index_col=0)
+    drv = get_store(season).wide('drivers', season, last_round=last_round)
     drivers_info = pd.read_csv('drivers_info.csv', index_col=0)
-    
-    df_class = drivers_info.merge(drv, how='right', left_on = ['Abbreviation'], right_index = True).reset_index()
-
-    nb = len(drv.transpose())+1
-    df_final = pd.DataFrame(columns=['DriverNumber', 'BroadcastName', 'Abbreviation', 'TeamName', 'TeamColor', 'FirstName', 'LastName', 'FullName','Points', 'Race'])
-    for i in range(1,nb):
-        df_class_ligne = df_class.loc[:,['DriverNumber', 'BroadcastName', 'Abbreviation', 'TeamName', 'TeamColor', 'FirstName', 'LastName', 'FullName',str(i)]]
-        df_class_ligne['Race'] = i
-        df_class_ligne.rename(columns={str(i): 'Points'}, inplace = True)
-        df_final = pd.concat([df_final, df_class_ligne])
-    df_final.reset_index(drop = True, inplace = True)
-
-    df_final = df_final.sort_values(by=['Race', 'Points'], ascending = [True, False])
-    df_final['classement']=len(drv)
-    longueur = len(df_final)
-    df_final.iloc[0,10] = 1
-
-    for i in range(1,longueur -1):
-        if df_final.iloc[i,9] == df_final.iloc[i-1,9]:
-            df_final.iloc[i,10] = df_final.iloc[i-1,10] +  1
-        else :
-            df_final.iloc[i,10] = 1
-
-    df_init = df_final[df_final['Race']==nb-1].copy()
-    df_init['Race'] = 0
-    df_init['Points'] = 0
-
-    df_final = pd.concat([df_final, df_init])
-            
-    colorMap ={}
-    df_class = pd.DataFrame(df_class)
-    for i in df_class.itertuples() :
-        if type(i.TeamColor) != str:
-            colorMap[i.Abbreviation] = '#FFFFFF'
-        else:
-            colorMap[i.Abbreviation] = '#' + i.TeamColor
-        
-            
-    df_final = df_final.sort_values(by=['Race', 'classement'], ascending = [True, True])
+
+    df_final = standings.champ_pos_frame(drv, drivers_info)
+    colorMap = standings.color_map(drv, drivers_info)
     maxY = df_final['Points'].max() + 20
     
     fig = px.bar(df_final, x="Abbreviation", y="Points",  color = "Abbreviation", color_discrete_map = colorMap, animation_frame="Race", 
@@ -83,45 +49,31 @@ def plot_champ_pos():
 
     return fig
 
-def get_round_mapping():
-    '''
-    Returns a round to event name mapping dictionary
-    '''
-    round_mapping = {}
-    for i in events_list.itertuples():
-        round_mapping[str(i.RoundNumber)] = i.CountryAbbreviation
-    return round_mapping
-
-@st.cache(allow_output_mutation=True)
-def get_drivers_standings_df():
+def get_drivers_standings_df(season, first_round, last_round):
     '''
     Displays the drivers standings
     '''
-    df = pd.read_csv('https://f1-jedha-bucket.s3.eu-west-3.amazonaws.com/data/drivers_standings.csv', index_col=0)
-    round_mapping = get_round_mapping()        
-    df.columns = df.columns.map(round_mapping)
+    df = get_store(season).wide('drivers', season, first_round, last_round)
+    df.columns = df.columns.map(schedule.round_mapping)
     return df
 
-@st.cache(allow_output_mutation=True)
-def get_constructors_standings():
+def get_constructors_standings(season, first_round, last_round):
     '''
     Displays the constructors standings
     '''
-    df = pd.read_csv('https://f1-jedha-bucket.s3.eu-west-3.amazonaws.com/data/constructors_standings.csv', index_col=0)
-    round_mapping = get_round_mapping()        
-    df.columns = df.columns.map(round_mapping)
+    df = get_store(season).wide('constructors', season, first_round, last_round)
+    df.columns = df.columns.map(schedule.round_mapping)
     return df
 
-def plot_compare_points(driver_1, driver_2):
+def plot_compare_points(driver_1, driver_2, season, first_round, last_round):
     '''
     Plots the points comparison between two drivers
     '''
-    round_mapping = get_round_mapping() 
-    df_drivers = pd.read_csv('https://f1-jedha-bucket.s3.eu-west-3.amazonaws.com/data/drivers_standings.csv', index_col=0)
+    df_drivers = get_store(season).wide('drivers', season, first_round, last_round)
     df_colors = pd.read_csv('drivers_info.csv', index_col=0)
 
     df_drivers_line = df_drivers[(df_drivers.index == driver_1) | (df_drivers.index == driver_2)].transpose().reset_index().rename(columns={'index': 'Round'})
-    df_drivers_line['country'] = df_drivers_line['Round'].map(round_mapping)
+    df_drivers_line['country'] = df_drivers_line['Round'].map(schedule.round_mapping)
     # df_drivers_line
 
     driver_1_team_color = '#' + df_colors[df_colors['Abbreviation'] == driver_1].values[0][4]
@@ -173,13 +125,23 @@ with col4:
     # Get Abbreviation of the second driver name
     driver_2 = driver_info[driver_info["FullName"] == driver_2]["Abbreviation"].values[0]
 
+col1, col2, col3 = st.columns([5, 4, 5])
+
+with col2:
+    # Rounds shown by the comparison and the standings tables
+    season_last_round = get_store(season).last_round('drivers', season)
+    if season_last_round > 1:
+        first_round, last_round = st.slider('Rounds', 1, season_last_round, (1, season_last_round))
+    else:
+        first_round, last_round = 1, season_last_round
+
 col1, col2, col3, col4, col5, col6 = st.columns([1, 15, 1, 1, 15, 1])
 
 with col2:
-    st.plotly_chart(plot_compare_points(driver_1, driver_2), use_container_width=True)
+    st.plotly_chart(plot_compare_points(driver_1, driver_2, season, first_round, last_round), use_container_width=True)
 
 with col5:
-    st.plotly_chart(plot_champ_pos(), use_container_width=True)
+    st.plotly_chart(plot_champ_pos(season, season_last_round), use_container_width=True)
 
 col1, col2, col3 = st.columns([3, 8, 3])
 
@@ -195,7 +157,7 @@ st.write('\n')
 col1, col2, col3, col4, col5, col6 = st.columns([1, 15, 1, 1, 15, 1])
 
 with col2:
-    st.dataframe(get_drivers_standings_df())
+    st.dataframe(get_drivers_standings_df(season, first_round, last_round))
 
 with col5:
-    st.dataframe(get_constructors_standings())
\ No newline at end of file
+    st.dataframe(get_constructors_standings(season, first_round, last_round))
\ No newline at end of file
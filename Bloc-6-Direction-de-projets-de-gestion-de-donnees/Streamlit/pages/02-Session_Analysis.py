@@ -1,7 +1,5 @@
 import fastf1 as ff1
 from fastf1 import plotting
-from fastf1 import utils
-from fastf1.core import Laps
 plotting.setup_mpl()
 ff1.Cache.enable_cache('cache/')
 import pandas as pd
@@ -16,9 +14,12 @@ from matplotlib.collections import LineCollection
 pio.templates.default = "plotly_dark"
 import warnings
 warnings.simplefilter(action='ignore', category=FutureWarning)
-import requests
 import streamlit as st
 from PIL import Image
+from session_cache import session_cache
+from session_datasets import get_datasets
+import data_access
+from schedule import get_schedule
 
 ### Config
 st.set_page_config(
@@ -28,12 +29,23 @@ st.set_page_config(
 )
 
 # Global variables
-events_list = ff1.get_event_schedule(2022)[2:]
-country_abbrev = ['BHR','SAU','AUS','ERO','MIA','ESP','MCO','AZE','CAN','GBR','AUT','FRA','HUN','BEL','NLD','ITA','SGP','JPN','USA','MXC','SAO','ABD']
-events_list['CountryAbbreviation'] = country_abbrev
 session_dict = {'conventional': ['Practice 1', 'Practice 2', 'Practice 3', 'Qualifying', 'Race'],
                 'sprint': ['Practice 1', 'Qualifying', 'Practice 2', 'Sprint', 'Race']}
 year = 2022
+schedule = get_schedule(year)
+
+# Datasets each visualisation is drawn from, computed only when a visualisation needs them
+visualisation_datasets = {
+    "Select a visualisation": [],
+    "Speed comparison": ['car_data', 'delta_time'],
+    "Session results": [],
+    "Fastest laps": [],
+    "Speed, Gears and Delta Time comparison": ['car_data', 'delta_time'],
+    "Speed visualization on track layout for First Driver": ['telemetry'],
+    "Gears visualization on track layout for First Driver": ['telemetry'],
+    "Delta Time on track layout": ['telemetry', 'track_delta'],
+    "Fastest lap gaps between all drivers": [],
+}
 
 
 # Functions
@@ -41,7 +53,7 @@ def get_start_line_data():
     '''
     Returns a dict with the start line postitions
     '''
-    start_line_dict_temp = requests.get('https://f1-jedha-bucket.s3.eu-west-3.amazonaws.com/data/start_line_dict.json').json()
+    start_line_dict_temp = data_access.read_json('start_line_dict.json')
     return {int(k): v for k, v in start_line_dict_temp.items()} 
 
 def format_time(timedelta_series, num):
@@ -55,27 +67,7 @@ def format_time(timedelta_series, num):
         
     return t_list_str
 
-def get_fastest_laps(session, driver_1, driver_2):
-    '''
-    Gets the fastest laps for the 2 selected drivers
-    '''
-    fastest_driver_1 = session.laps.pick_driver(driver_1).pick_fastest()
-    fastest_driver_2 = session.laps.pick_driver(driver_2).pick_fastest()
-    
-    return fastest_driver_1, fastest_driver_2
-
-def get_car_data(fastest_driver_1, fastest_driver_2):
-    '''
-    Gets the car data for the 2 selected drivers on their fastest laps
-    '''
-    car_data_1 = fastest_driver_1.get_car_data().add_distance()
-    car_data_1['Distance'] = round(car_data_1['Distance'])
-    car_data_2 = fastest_driver_2.get_car_data().add_distance()
-    car_data_2['Distance'] = round(car_data_2['Distance'])
-    
-    return car_data_1, car_data_2
-
-def plot_stacked_data(session, car_data_1, car_data_2, driver_1, driver_2, ref_tel, delta_time):
+def plot_stacked_data(session, car_data_1, car_data_2, driver_1, driver_2, delta_distance, delta_time):
     '''
     Plots stacked telemetry data for the 2 selected drivers
     '''
@@ -86,7 +78,7 @@ def plot_stacked_data(session, car_data_1, car_data_2, driver_1, driver_2, ref_t
 
     fig.add_trace(go.Scatter(x=car_data_1['Distance'], y=car_data_1['Speed'], name=driver_1, line_color=ff1.plotting.driver_color(driver_1), hovertemplate = hovertemplate_speed, opacity=0.8), secondary_y=False)
     fig.add_trace(go.Scatter(x=car_data_2['Distance'], y=car_data_2['Speed'], name=driver_2, line_color=ff1.plotting.driver_color(driver_2), hovertemplate = hovertemplate_speed, opacity=0.8), secondary_y=False)
-    fig.add_trace(go.Scatter(x=ref_tel['Distance'], y=delta_time, line_color='white', name='Delta Time', hovertemplate = 'Delta Time: %{y:.3f} sec', opacity=0.8, line_width=1), secondary_y=True)
+    fig.add_trace(go.Scatter(x=delta_distance, y=delta_time, line_color='white', name='Delta Time', hovertemplate = 'Delta Time: %{y:.3f} sec', opacity=0.8, line_width=1), secondary_y=True)
 
     fig.update_yaxes(title_text="Speed (km/h)", secondary_y=False)
     fig.update_yaxes(title_text=f"<-- {driver_2} ahead | {driver_1} ahead -->", secondary_y=True)
@@ -94,7 +86,7 @@ def plot_stacked_data(session, car_data_1, car_data_2, driver_1, driver_2, ref_t
     
     return fig
 
-def plot_unstacked_data(session, car_data_1, car_data_2, driver_1, driver_2, ref_tel, delta_time):
+def plot_unstacked_data(session, car_data_1, car_data_2, driver_1, driver_2, delta_distance, delta_time):
     '''
     Plots unstacked telemetry data for the 2 selected drivers
     '''
@@ -110,7 +102,7 @@ def plot_unstacked_data(session, car_data_1, car_data_2, driver_1, driver_2, ref
     fig.append_trace(go.Scatter(x=car_data_1['Distance'], y=car_data_1['nGear'], name=driver_1, line_color=ff1.plotting.driver_color(driver_1), hovertemplate = hovertemplate_gear, opacity=0.8, showlegend=False), 2, 1)
     fig.append_trace(go.Scatter(x=car_data_2['Distance'], y=car_data_2['nGear'], name=driver_2, line_color=ff1.plotting.driver_color(driver_2), hovertemplate = hovertemplate_gear, opacity=0.8, showlegend=False), 2, 1)
 
-    fig.append_trace(go.Scatter(x=ref_tel['Distance'], y=delta_time, line_color='white', mode='lines', name='Delta Time', hovertemplate = 'Delta Time: %{y:.3f} sec', opacity=0.8), 3, 1)
+    fig.append_trace(go.Scatter(x=delta_distance, y=delta_time, line_color='white', mode='lines', name='Delta Time', hovertemplate = 'Delta Time: %{y:.3f} sec', opacity=0.8), 3, 1)
 
     fig.update_yaxes(title_text="Speed (km/h)", row=1, col=1)
     fig.update_yaxes(title_text="Gear", row=2, col=1)
@@ -120,16 +112,6 @@ def plot_unstacked_data(session, car_data_1, car_data_2, driver_1, driver_2, ref
     fig.update_layout(width=1200, height=1200, title_text=plot_title, title_x=0.1)
     return fig
 
-def get_telemetry_data(fastest_driver_1, fastest_driver_2):
-    '''
-    Returns advanced telemetry data for the 2 selected drivers
-    '''
-    lap_1 = fastest_driver_1.telemetry
-    lap_2 = fastest_driver_2.telemetry
-    lap_1 = lap_1[lap_1['Source'] != 'pos'].reset_index(drop=True)
-    lap_2 = lap_2[lap_2['Source'] != 'pos'].reset_index(drop=True)
-    return lap_1, lap_2
-
 def plot_track_speed(session, lap_1, driver_1):
     '''
     Plots the fastest lap speed on track for the selected driver
@@ -303,12 +285,12 @@ def plot_track_delta(session, lap_1, driver_1, driver_2, delta_time):
     # Show the plot
     return fig
 
-def add_driver_info():
+def add_driver_info(session):
     '''
     Updates the drivers info csv
     '''
     drivers_info = pd.read_csv('drivers_info.csv', index_col=0)
-    drivers_standings = pd.read_csv('https://f1-jedha-bucket.s3.eu-west-3.amazonaws.com/data/drivers_standings.csv', index_col=0)
+    drivers_standings = data_access.read_csv('drivers_standings.csv', index_col=0)
     missing_drivers = [x for x in drivers_standings.index.tolist() if x not in drivers_info['Abbreviation'].tolist()]
     if len(missing_drivers) > 0:
         df = session.results.copy().drop(columns=["Position", "GridPosition", "Q1", "Q2", "Q3", "Time", "Status", "Points"])
@@ -378,23 +360,12 @@ def format_results_race(session_type):
         results_formatted['Position'] = results_formatted['Position'].astype(int)
         return results_formatted
 
-def fastest_lap_comparison(fastest_laps):
-    # Pass session.laps.pick_fastest() as argument when calling the function
+def fastest_lap_comparison(session):
     '''
     Plots the comparison of the best lap times of the selected session
     '''
-    drivers = session.laps.pick_quicklaps()['Driver'].unique()
-
-    list_fastest_laps = []
-    for drv in drivers:
-        drvs_fastest_lap = session.laps.pick_quicklaps().pick_driver(drv).pick_fastest()
-        list_fastest_laps.append(drvs_fastest_lap)
-    fastest_laps = Laps(list_fastest_laps).sort_values(by='LapTime').reset_index(drop=True)
-
-    pole_lap = fastest_laps.pick_fastest()
-    fastest_laps['LapTimeDelta'] = fastest_laps['LapTime'] - pole_lap['LapTime']
-
-    fastest_laps_final = fastest_laps.dropna(subset=['Time']).copy()
+    # Fastest quick lap of each driver and its delta to the pole lap, computed by the ingestion job
+    fastest_laps_final = session.fastest_laps.copy()
 
     teamcol = {}
     df_results = pd.DataFrame(session.results)
@@ -429,12 +400,30 @@ def fastest_lap_comparison(fastest_laps):
 
     return fig
 
-@st.cache(allow_output_mutation=True)
+def plot_gap_matrix(session):
+    '''
+    Plots the gap at the end of the fastest lap between every pair of drivers of the session
+    '''
+    # Drivers in the order of their fastest lap
+    drivers = [d for d in session.fastest_laps['Driver'] if d in session.delta_matrix().index]
+    matrix = session.delta_matrix().loc[drivers, drivers]
+    limit = float(np.abs(matrix.to_numpy()).max())
+    plot_title = f"{session.event.year} {session.event.EventName} - {session.name} - Fastest lap gaps"
+
+    fig = px.imshow(matrix,
+                    color_continuous_scale='RdYlGn_r',
+                    zmin=-limit, zmax=limit,
+                    labels=dict(x="Compared driver", y="Reference driver", color="Gap (sec)"),
+                    width=1000, height=800,
+                    template='plotly_dark')
+
+    fig.update_traces(hovertemplate='%{x} vs %{y}: %{z:.3f} sec<extra></extra>')
+    fig.update_layout(title_text=plot_title, title_x=0.5)
+    return fig
+
 def load_data_session(year, gp_round, ses):
-    session = ff1.get_session(year, gp_round, ses)
-    session.load(weather=False, telemetry=True, messages=False)
-    add_driver_info()
-    return session
+    # Session artifacts written by ingest_sessions.py, kept in the cache shared by all pages and users
+    return session_cache.get(year, gp_round, ses, on_load=add_driver_info)
 
 with open('style.css') as f:
     st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
@@ -453,19 +442,19 @@ with col2:
     """
     * On this page, you can pick an event, and one of its sessions, then two of the drivers that participated in the session.
     * You can pick up to two different visualizations to display of each side of the page. Please note that the session results table is not avaible for Free Practice sessions.
-    * Please let the page load entirely before trying to use another dropdown menu. If that session data has not be loaded to the cache yet, it may take up to a minute to load.
+    * Please let the page load entirely before trying to use another dropdown menu. If that session has not been ingested yet, it may take up to a minute to load.
     """
 
 col1, col2, col3, col4, col5, col6 = st.columns([4, 2, 2, 2, 2, 4])
 
 with col3:
-    gp_name = st.selectbox('Event', (events_list["EventName"]), index = 6)
+    gp_name = st.selectbox('Event', schedule.event_names(), index = 6)
         
-gp_round = events_list[events_list['EventName'] == gp_name]['RoundNumber'].values[0]
+gp_round = schedule.by_name(gp_name)['RoundNumber']
 
 try:
     with col4:
-        if list(events_list[events_list["RoundNumber"] == gp_round]["EventFormat"])[0] == list(session_dict.keys())[0]:
+        if schedule.by_round(gp_round)["EventFormat"] == list(session_dict.keys())[0]:
             ses = st.selectbox("Session", (list(session_dict.values())[0]), key=10, index = 4)
         else:
             ses = st.selectbox("Session", (list(session_dict.values())[1]), key=11, index = 4)
@@ -474,10 +463,10 @@ try:
 
     col1, col2, col3, col4, col5, col6 = st.columns([4, 2, 2, 2, 2, 4])
 
-    if len(session.laps.pick_quicklaps()['Driver'].unique()) > 2:
-        drivers = session.laps.pick_quicklaps()['Driver'].unique()
+    if len(session.quick_drivers) > 2:
+        drivers = session.quick_drivers
     else:
-        drivers = session.laps['Driver'].unique()
+        drivers = session.drivers
 
     with col3:
         driver_1 = st.selectbox('First driver', (session.results[session.results.Abbreviation.isin(drivers)]["FullName"]), index = 0)
@@ -489,23 +478,21 @@ try:
         # Get Abbreviation of the first driver name
         driver_2 = session.results[session.results["FullName"] == driver_2]["Abbreviation"].values[0]
 
-    fastest_driver_1, fastest_driver_2 = get_fastest_laps(session, driver_1, driver_2)
-    delta_time, ref_tel, compare_tel = utils.delta_time(fastest_driver_1, fastest_driver_2)
-    car_data_1, car_data_2 = get_car_data(fastest_driver_1, fastest_driver_2)
-    lap_1, lap_2 = get_telemetry_data(fastest_driver_1, fastest_driver_2)
+    # Nothing is computed yet, each visualisation asks for its datasets
+    datasets = get_datasets(session, driver_1, driver_2)
 
     col1, col2, col3, col4, col5, col6 = st.columns([1, 2, 1, 1, 2, 1])
     with col2:
         if ses == 'Qualifying' or ses == 'Race' or ses == 'Sprint':
-            decision_1 = st.selectbox(" ", ("Select a visualisation", "Speed comparison", "Session results", "Fastest laps", "Speed, Gears and Delta Time comparison", "Speed visualization on track layout for First Driver", "Gears visualization on track layout for First Driver", "Delta Time on track layout"), key = 1)
+            decision_1 = st.selectbox(" ", ("Select a visualisation", "Speed comparison", "Session results", "Fastest laps", "Speed, Gears and Delta Time comparison", "Speed visualization on track layout for First Driver", "Gears visualization on track layout for First Driver", "Delta Time on track layout", "Fastest lap gaps between all drivers"), key = 1)
         else:
-            decision_1 = st.selectbox(" ", ("Select a visualisation", "Speed comparison", "Fastest laps", "Speed, Gears and Delta Time comparison", "Speed visualization on track layout for First Driver", "Gears visualization on track layout for First Driver", "Delta Time on track layout"), key = 2)
+            decision_1 = st.selectbox(" ", ("Select a visualisation", "Speed comparison", "Fastest laps", "Speed, Gears and Delta Time comparison", "Speed visualization on track layout for First Driver", "Gears visualization on track layout for First Driver", "Delta Time on track layout", "Fastest lap gaps between all drivers"), key = 2)
 
     with col5:
         if ses == 'Qualifying' or ses == 'Race' or ses == 'Sprint':
-            decision_2 = st.selectbox(" ", ("Select a visualisation", "Speed comparison", "Session results", "Fastest laps", "Speed, Gears and Delta Time comparison", "Speed visualization on track layout for First Driver", "Gears visualization on track layout for First Driver", "Delta Time on track layout"), key = 3)
+            decision_2 = st.selectbox(" ", ("Select a visualisation", "Speed comparison", "Session results", "Fastest laps", "Speed, Gears and Delta Time comparison", "Speed visualization on track layout for First Driver", "Gears visualization on track layout for First Driver", "Delta Time on track layout", "Fastest lap gaps between all drivers"), key = 3)
         else:
-            decision_2 = st.selectbox(" ", ("Select a visualisation", "Speed comparison", "Fastest laps", "Speed, Gears and Delta Time comparison", "Speed visualization on track layout for First Driver", "Gears visualization on track layout for First Driver", "Delta Time on track layout"), key = 4)
+            decision_2 = st.selectbox(" ", ("Select a visualisation", "Speed comparison", "Fastest laps", "Speed, Gears and Delta Time comparison", "Speed visualization on track layout for First Driver", "Gears visualization on track layout for First Driver", "Delta Time on track layout", "Fastest lap gaps between all drivers"), key = 4)
 
     col1, col2, col3, col4, col5, col6 = st.columns([1, 15, 1, 1, 15, 1])
 
@@ -515,8 +502,16 @@ try:
         if decision == "Select a visualisation":
             return st.markdown("<h5 style='text-align: center; color: white;'>No selection made</h5>", unsafe_allow_html=True)
 
+        data = datasets.require(visualisation_datasets[decision])
+        if 'car_data' in data:
+            car_data_1, car_data_2 = data['car_data']
+        if 'delta_time' in data:
+            delta_time, delta_distance = data['delta_time']
+        if 'telemetry' in data:
+            lap_1, lap_2 = data['telemetry']
+
         if decision == "Speed comparison":
-            viz1 = plot_stacked_data(session, car_data_1, car_data_2, driver_1, driver_2, ref_tel, delta_time)
+            viz1 = plot_stacked_data(session, car_data_1, car_data_2, driver_1, driver_2, delta_distance, delta_time)
 
         elif decision == "Session results":
             st.write("")
@@ -527,10 +522,10 @@ try:
             return st.dataframe(format_results_race(ses))
 
         elif decision == "Fastest laps":
-            viz1 = fastest_lap_comparison(session.laps.pick_fastest())
+            viz1 = fastest_lap_comparison(session)
 
         elif decision == "Speed, Gears and Delta Time comparison":
-            viz1 = plot_unstacked_data(session, car_data_1, car_data_2, driver_1, driver_2, ref_tel, delta_time)
+            viz1 = plot_unstacked_data(session, car_data_1, car_data_2, driver_1, driver_2, delta_distance, delta_time)
 
         elif decision == "Speed visualization on track layout for First Driver":
             return st.pyplot(plot_track_speed(session, lap_1, driver_1))
@@ -539,7 +534,12 @@ try:
             return st.pyplot(plot_track_gear(session, lap_1, driver_1))
 
         elif decision == "Delta Time on track layout":
-            return st.pyplot(plot_track_delta(session, lap_1, driver_1, driver_2, delta_time))
+            return st.pyplot(plot_track_delta(session, lap_1, driver_1, driver_2, data['track_delta']))
+
+        elif decision == "Fastest lap gaps between all drivers":
+            if session.delta_matrix().empty:
+                return st.markdown("<h5 style='text-align: center; color: white;'>No car data to compare the drivers</h5>", unsafe_allow_html=True)
+            viz1 = plot_gap_matrix(session)
         
         return st.plotly_chart(viz1, use_container_width=True)
 
@@ -548,6 +548,12 @@ try:
 
     with col5:
         display_visualisation(decision_2)
+
+    with st.sidebar.expander("Session cache"):
+        cache_stats = session_cache.stats()
+        st.write(f"{cache_stats['entries']} sessions, {cache_stats['bytes'] / 1e6:.1f} MB of {cache_stats['max_bytes'] / 1e6:.0f} MB")
+        st.write(f"{cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['evictions']} evictions")
+        st.dataframe(pd.DataFrame(cache_stats['sessions']))
             
 except:
     st.write("")
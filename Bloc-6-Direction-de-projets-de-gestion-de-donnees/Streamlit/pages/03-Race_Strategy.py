@@ -12,6 +12,8 @@ warnings.simplefilter(action='ignore', category=FutureWarning)
 
 import streamlit as st
 from PIL import Image
+import data_access
+from schedule import get_schedule
 
 from timple.timedelta import strftimedelta
 ff1.plotting.setup_mpl(mpl_timedelta_support=True, color_scheme=None, misc_mpl_mods=False)
@@ -24,7 +26,7 @@ st.set_page_config(
 )
 
 # Global variables
-events_list = ff1.get_event_schedule(2022)[2:]
+schedule = get_schedule(2022)
 
 compound_colors = {
     'SOFT': '#FF3333',
@@ -38,9 +40,8 @@ def plot_tyre_life(gp_round):
     Plots the evolution of the tyre life
     '''
     
-    url = f'https://f1-jedha-bucket.s3.eu-west-3.amazonaws.com/data/tyre_life_data_{gp_round}.csv'
-    df_times = pd.read_csv(url, index_col=0)
-    event_name = events_list.iloc[gp_round]['EventName']
+    df_times = data_access.read_csv(f'tyre_life_data_{gp_round}.csv', index_col=0)
+    event_name = schedule.by_round(gp_round)['EventName']
     plot_title = f"{event_name} - Tyre Life Prediction"
     hovertemplate = '<b>Lap:</b> %{x}<br><b>Time:</b> %{customdata}'
 
@@ -84,8 +85,7 @@ def format_dataframe(gp_round):
     '''
     Returns a formatted dataframe suitable for plotting strategy predictions
     '''
-    url = f'https://f1-jedha-bucket.s3.eu-west-3.amazonaws.com/data/predicted_strategy_round_{gp_round}.csv'
-    df = pd.read_csv(url, index_col=0).reset_index(drop=True)
+    df = data_access.read_csv(f'predicted_strategy_round_{gp_round}.csv', index_col=0).reset_index(drop=True)
     
     compound_colors = {
         'SOFT': '#FF3333',
@@ -154,7 +154,7 @@ def plot_strategies(gp_round):
     '''
     df = format_dataframe(gp_round)
     hovertemplate = '<b>Max Tyre Life:</b> %{x}<br><b>Total Race Time:</b> %{customdata}'
-    event_name = events_list.iloc[gp_round]['EventName']
+    event_name = schedule.by_round(gp_round)['EventName']
     plot_title = f"{event_name} - Optimal Strategies Prediction"
 
     fig = go.Figure()
@@ -198,24 +198,16 @@ with col2:
     * The right side chart displays our prediction based on this data, and shows the optimal strategies for one and two stops. The mouseover shows the total race time for each one.
     """
     
-# Duplicate a row as a new DataFrame
-top_row = events_list.loc[[2]]
-
-# Rename index of duplicated row
-top_row.rename(index={2:1},inplace=True)
-
-# Rename EventName to add it later in the Streamlit selectbox
-top_row["EventName"] = "Select an event"
-
-# Concatenate the two DataFrames to have the new row on top
-events_list = pd.concat([top_row, events_list], axis=0)
+# "Select an event" on top of the events in the Streamlit selectbox
+events_names = ["Select an event"] + schedule.event_names()
 
 col1, col2, col3 = st.columns([4, 2, 4])
 
 with col2:
-    gp_name = st.selectbox('', (events_list["EventName"]))
+    gp_name = st.selectbox('', events_names)
 
-gp_round = events_list[events_list['EventName'] == gp_name]['RoundNumber'].values[0]
+if gp_name != "Select an event":
+    gp_round = schedule.by_name(gp_name)['RoundNumber']
 
 try:
     
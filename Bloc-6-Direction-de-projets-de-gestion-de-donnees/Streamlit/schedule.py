@@ -0,0 +1,86 @@
+"""
+Event schedule shared by the F1 pages.
+
+The schedule of a season is loaded once per process, from FastF1 or, when FastF1
+cannot reach its sources, from the local snapshot schedule_<year>.csv. Events are
+indexed by round number, event name and country abbreviation (the short names of
+the standings tables), so the pages look them up without scanning the schedule.
+"""
+import functools
+import os
+
+import pandas as pd
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+COLUMNS = ['RoundNumber', 'Country', 'Location', 'EventName', 'EventDate', 'EventFormat',
+           'Session1', 'Session2', 'Session3', 'Session4', 'Session5']
+
+
+def snapshot_path(year):
+    return os.path.join(HERE, f"schedule_{year}.csv")
+
+
+def read_snapshot(year):
+    return pd.read_csv(snapshot_path(year), parse_dates=['EventDate'])
+
+
+def fetch_schedule(year):
+    '''
+    Returns the race events of a season from FastF1, with the country abbreviations of the snapshot
+    '''
+    import fastf1 as ff1
+    events = pd.DataFrame(ff1.get_event_schedule(year, include_testing=False))[COLUMNS]
+    if os.path.exists(snapshot_path(year)):
+        abbreviations = read_snapshot(year).set_index('RoundNumber')['CountryAbbreviation']
+        events['CountryAbbreviation'] = events['RoundNumber'].map(abbreviations)
+    else:
+        events['CountryAbbreviation'] = events['Location'].str[:3].str.upper()
+    return events
+
+
+class Schedule:
+    """
+    Race events of a season, with constant time lookups by round, name and country abbreviation
+    """
+
+    def __init__(self, year, events):
+        self.year = year
+        self.events = events.sort_values('RoundNumber').reset_index(drop=True)
+        records = self.events.to_dict('records')
+        self._by_round = {int(e['RoundNumber']): e for e in records}
+        self._by_name = {e['EventName']: e for e in records}
+        self._by_abbreviation = {e['CountryAbbreviation']: e for e in records}
+        # Round number, as in the standings CSV columns, to country abbreviation
+        self.round_mapping = {str(r): e['CountryAbbreviation'] for r, e in self._by_round.items()}
+
+    def by_round(self, gp_round):
+        return self._by_round[int(gp_round)]
+
+    def by_name(self, event_name):
+        return self._by_name[event_name]
+
+    def by_abbreviation(self, abbreviation):
+        return self._by_abbreviation[abbreviation]
+
+    def event_names(self):
+        return list(self._by_name)
+
+    def rounds(self):
+        return list(self._by_round)
+
+
+@functools.lru_cache(maxsize=None)
+def get_schedule(year=2022):
+    '''
+    Returns the schedule of a season, loaded on the first call of the process
+    '''
+    try:
+        events = fetch_schedule(year)
+    except Exception as e:
+        if not os.path.exists(snapshot_path(year)):
+            raise
+        print(f"Could not load the {year} schedule from FastF1, using the local snapshot: {e}")
+        events = read_snapshot(year)
+    return Schedule(year, events)
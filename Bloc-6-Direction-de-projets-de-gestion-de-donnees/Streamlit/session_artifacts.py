@@ -0,0 +1,127 @@
+"""
+Reader of the F1 session artifacts written by ingest_sessions.py.
+
+Each session is a folder of Parquet files: the laps, the results, the fastest lap
+of each driver, and the car data and telemetry of each driver's fastest lap
+(float32 channels), and the delta times of all drivers on a common distance grid
+(see delta_matrix.py). The pages read these files instead of loading a FastF1
+session on the request path.
+"""
+import json
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ARTIFACTS_DIR = os.environ.get("F1_ARTIFACTS_DIR", os.path.join(HERE, "artifacts"))
+
+
+def session_dir(year, gp_round, session_name, root=None):
+    '''
+    Returns the folder of the artifacts of a session, e.g. artifacts/2022/07/qualifying
+    '''
+    return os.path.join(root or ARTIFACTS_DIR, str(year), f"{int(gp_round):02d}", session_name.lower().replace(" ", "_"))
+
+
+def is_ingested(year, gp_round, session_name, root=None):
+    # session.json is written last, a folder without it is incomplete
+    return os.path.exists(os.path.join(session_dir(year, gp_round, session_name, root), "session.json"))
+
+
+class SessionArtifacts:
+    """
+    Session read from its artifacts, with the attributes of a FastF1 session used by the pages
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "session.json")) as f:
+            info = json.load(f)
+        self.name = info["name"]
+        self.event = SimpleNamespace(year=info["year"], EventName=info["event_name"], RoundNumber=info["round"])
+        self.drivers = info["drivers"]
+        self.quick_drivers = info["quick_drivers"]
+        self.laps = pd.read_parquet(os.path.join(path, "laps.parquet"))
+        self.results = pd.read_parquet(os.path.join(path, "results.parquet"))
+        self.fastest_laps = pd.read_parquet(os.path.join(path, "fastest_laps.parquet"))
+
+        # Channels of the drivers already read, by driver
+        self._car_data = {}
+        self._telemetry = {}
+        # Datasets derived for each pair of drivers, see session_datasets.py
+        self.derived = {}
+        self._delta_grid = None
+        self._delta_matrix = None
+
+    def _read_driver(self, store, folder, driver):
+        if driver not in store:
+            store[driver] = pd.read_parquet(os.path.join(self.path, folder, f"{driver}.parquet"))
+        # A copy, so the callers can add columns without changing the stored frame
+        return store[driver].copy()
+
+    def car_data(self, driver):
+        '''
+        Returns the car data of the fastest lap of a driver, Time in seconds
+        '''
+        return self._read_driver(self._car_data, "car_data", driver)
+
+    def telemetry(self, driver):
+        '''
+        Returns the telemetry (position and car data merged) of the fastest lap of a driver
+        '''
+        return self._read_driver(self._telemetry, "telemetry", driver)
+
+    def delta_grid(self):
+        '''
+        Returns the elapsed times of every driver on the common distance grid of the session (see delta_matrix.py),
+        None when it was not written (sessions ingested before the delta matrices or without usable car data)
+        '''
+        if self._delta_grid is None:
+            from delta_matrix import GRID_FILE
+            path = os.path.join(self.path, GRID_FILE)
+            if os.path.exists(path):
+                self._delta_grid = pd.read_parquet(path)
+        return self._delta_grid
+
+    def delta_matrix(self):
+        '''
+        Returns the gap of each driver (column) to each reference driver (row) at the end of the lap,
+        empty when no driver has usable car data
+        '''
+        if self._delta_matrix is None:
+            from delta_matrix import MATRIX_FILE, build_delta_grid, gap_matrix
+            path = os.path.join(self.path, MATRIX_FILE)
+            if os.path.exists(path):
+                self._delta_matrix = pd.read_parquet(path)
+            else:
+                # Not written by the ingestion job, built in memory
+                delta_grid = build_delta_grid({driver: self.car_data(driver) for driver in self.car_data_drivers()})
+                self._delta_matrix = gap_matrix(delta_grid) if delta_grid is not None else pd.DataFrame()
+        return self._delta_matrix
+
+    def car_data_drivers(self):
+        return sorted(os.path.splitext(f)[0] for f in os.listdir(os.path.join(self.path, "car_data")))
+
+    def memory_usage(self):
+        '''
+        Returns the estimated memory used by the session, in bytes
+        '''
+        frames = [self.laps, self.results, self.fastest_laps] + list(self._car_data.values()) + list(self._telemetry.values())
+        frames += [frame for frame in (self._delta_grid, self._delta_matrix) if frame is not None]
+        derived = sum(datasets.memory_usage() for datasets in self.derived.values())
+        return int(sum(frame.memory_usage(index=True, deep=True).sum() for frame in frames)) + derived
+
+
+def load_session(year, gp_round, session_name, root=None):
+    '''
+    Returns the artifacts of a session, ingested first from FastF1 when they are missing
+    '''
+    if not is_ingested(year, gp_round, session_name, root):
+        # Slow path, only taken for sessions the ingestion job has not processed yet
+        from ingest_sessions import ingest_session
+        # Another request may be ingesting it too, the first artifacts published are kept
+        ingest_session(year, gp_round, session_name, root, replace=False)
+    return SessionArtifacts(session_dir(year, gp_round, session_name, root))
+
@@ -0,0 +1,130 @@
+"""
+Session cache shared by all the pages and all the users of the dashboard.
+
+Streamlit imports this module once per server process, so every page and every
+user share the same cache. It keeps the most recently used sessions and evicts the
+least recently used ones when there are more than F1_SESSION_CACHE_MAX_ENTRIES
+sessions or when their estimated memory goes over F1_SESSION_CACHE_MAX_MB.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from session_artifacts import load_session
+
+
+MAX_ENTRIES = int(os.environ.get("F1_SESSION_CACHE_MAX_ENTRIES", 8))
+MAX_BYTES = int(float(os.environ.get("F1_SESSION_CACHE_MAX_MB", 512)) * 1024 * 1024)
+
+
+class SessionCache:
+    """
+    LRU cache of the sessions, bounded by number of entries and by estimated memory
+    """
+
+    def __init__(self, loader=load_session, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Lock of each session being loaded
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, year, gp_round, session_name, on_load=None):
+        '''
+        Returns a session, loaded on a miss. `on_load` is called with the session after it is loaded
+        '''
+        key = (int(year), int(gp_round), session_name)
+        with self._lock:
+            session = self._hit(key)
+            if session is not None:
+                return session
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        # Only one user loads (and may ingest) a session, the others wait for it
+        with loading:
+            with self._lock:
+                session = self._hit(key)
+                if session is not None:
+                    return session
+                self.misses += 1
+
+            try:
+                # Loaded outside the cache lock so the users of the other sessions are not blocked
+                start = time.perf_counter()
+                session = self.loader(*key)
+                if on_load is not None:
+                    on_load(session)
+                load_seconds = time.perf_counter() - start
+
+                with self._lock:
+                    self._entries[key] = {
+                        "session": session,
+                        "bytes": session.memory_usage(),
+                        "hits": 0,
+                        "load_seconds": load_seconds,
+                        "last_access": time.time(),
+                    }
+                    self._evict()
+                    return session
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+
+    def _hit(self, key):
+        '''
+        Returns the cached session of `key` and counts the hit, None when it is not cached
+        '''
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        entry["hits"] += 1
+        entry["last_access"] = time.time()
+        # The session grows as the channels of its drivers are read
+        entry["bytes"] = entry["session"].memory_usage()
+        self.hits += 1
+        self._evict()
+        return entry["session"]
+
+    def _evict(self):
+        # The most recent session is kept even if it is larger than the limit on its own
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.total_bytes() > self.max_bytes):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def total_bytes(self):
+        return sum(entry["bytes"] for entry in self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        '''
+        Returns the cache counters and, for each cached session, its size and hits
+        '''
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.total_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "sessions": [
+                    {"year": key[0], "round": key[1], "session": key[2], "bytes": entry["bytes"],
+                     "hits": entry["hits"], "load_seconds": round(entry["load_seconds"], 3)}
+                    for key, entry in reversed(self._entries.items())
+                ],
+            }
+
+
+# The cache shared by every page
+session_cache = SessionCache()
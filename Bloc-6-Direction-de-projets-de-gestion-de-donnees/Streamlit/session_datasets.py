@@ -0,0 +1,124 @@
+"""
+Datasets derived from a session for a pair of drivers, computed on demand.
+
+Each dataset declares the datasets it is computed from. A visualisation asks only
+for the datasets it displays; they are computed with their dependencies the first
+time and kept with the session, one set per pair of drivers, so switching between
+visualisations or coming back to a pair never computes them again. The datasets
+leave the memory with the session when the session cache evicts it.
+"""
+import threading
+
+import numpy as np
+
+from delta_matrix import build_delta_grid
+
+
+def car_data(session, driver_1, driver_2):
+    '''
+    Car data of the fastest laps of the 2 drivers, distance rounded to the meter
+    '''
+    car_data_1 = session.car_data(driver_1)
+    car_data_1['Distance'] = round(car_data_1['Distance'])
+    car_data_2 = session.car_data(driver_2)
+    car_data_2['Distance'] = round(car_data_2['Distance'])
+    return car_data_1, car_data_2
+
+
+def delta(session, driver_1, driver_2):
+    '''
+    Delta time of the second driver to the first one along the distance grid of the session, and the grid
+    '''
+    delta_grid = session.delta_grid()
+    if delta_grid is None or driver_1 not in delta_grid or driver_2 not in delta_grid:
+        # No grid written for the session, or a driver left out of it: only this pair is resampled
+        delta_grid = build_delta_grid({driver_1: session.car_data(driver_1), driver_2: session.car_data(driver_2)})
+        if delta_grid is None or driver_1 not in delta_grid or driver_2 not in delta_grid:
+            raise ValueError(f"Not enough car data to compare {driver_1} and {driver_2}")
+    return (delta_grid[driver_2] - delta_grid[driver_1]).to_numpy(), delta_grid['Distance'].to_numpy()
+
+
+def telemetry(session, driver_1, driver_2):
+    '''
+    Telemetry (positions and car data) of the fastest laps of the 2 drivers
+    '''
+    return session.telemetry(driver_1), session.telemetry(driver_2)
+
+
+def track_delta(session, driver_1, driver_2, telemetry, delta_time):
+    '''
+    Delta time at each telemetry sample of the first driver, to color the track layout
+    '''
+    lap_1 = telemetry[0]
+    delta, distance = delta_time
+    return np.interp(lap_1['Distance'].to_numpy(dtype=float), distance, delta)
+
+
+# Name of each dataset: function computing it and the datasets it is computed from
+DATASETS = {
+    'car_data': (car_data, ()),
+    'delta_time': (delta, ()),
+    'telemetry': (telemetry, ()),
+    'track_delta': (track_delta, ('telemetry', 'delta_time')),
+}
+
+
+class SessionDatasets:
+    """
+    Datasets of a session for one pair of drivers, each computed once, when first needed
+    """
+
+    def __init__(self, session, driver_1, driver_2, datasets=DATASETS):
+        self.session = session
+        self.driver_1 = driver_1
+        self.driver_2 = driver_2
+        self.datasets = datasets
+        self._values = {}
+        self._lock = threading.RLock()
+
+    def get(self, name, _path=()):
+        if name in _path:
+            raise ValueError(f"Circular dependency between the datasets {' -> '.join(_path + (name,))}")
+        with self._lock:
+            if name not in self._values:
+                function, requires = self.datasets[name]
+                dependencies = [self.get(dependency, _path + (name,)) for dependency in requires]
+                self._values[name] = function(self.session, self.driver_1, self.driver_2, *dependencies)
+            return self._values[name]
+
+    def require(self, names):
+        '''
+        Returns the datasets of `names` by name, computing the missing ones and their dependencies
+        '''
+        return {name: self.get(name) for name in names}
+
+    def computed(self):
+        return list(self._values)
+
+    def memory_usage(self):
+        '''
+        Returns the estimated memory of the datasets computed, in bytes
+        '''
+        total = 0
+        for value in self._values.values():
+            for item in (value if isinstance(value, tuple) else (value,)):
+                if hasattr(item, 'memory_usage'):
+                    usage = item.memory_usage(index=True, deep=True)
+                    total += int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+                elif hasattr(item, 'nbytes'):
+                    total += int(item.nbytes)
+        return total
+
+
+_lock = threading.Lock()
+
+
+def get_datasets(session, driver_1, driver_2):
+    '''
+    Returns the datasets of a session for a pair of drivers, kept with the session
+    '''
+    with _lock:
+        key = (driver_1, driver_2)
+        if key not in session.derived:
+            session.derived[key] = SessionDatasets(session, driver_1, driver_2)
+        return session.derived[key]
@@ -0,0 +1,58 @@
+"""
+Reshaping of the championship standings for the season page.
+
+The standings CSVs are wide, one row per driver and one column per round with the
+cumulated points. The animated bar chart needs them long, one row per driver and
+round with the position of the driver after that round. The reshaping is a single
+reshape of the points array and a ranking per round, so it stays fast for many
+seasons of rounds.
+"""
+import numpy as np
+import pandas as pd
+
+
+INFO_COLUMNS = ['DriverNumber', 'BroadcastName', 'Abbreviation', 'TeamName', 'TeamColor', 'FirstName', 'LastName', 'FullName']
+
+
+def rank_rounds(standings, keys=('Race',)):
+    '''
+    Returns the long standings sorted by round and points, with the position after each round in `classement`.
+    Drivers level on points keep their order, as the dashboard always did
+    '''
+    keys = list(keys)
+    standings = standings.sort_values(by=keys + ['Points'], ascending=[True] * len(keys) + [False], kind='mergesort')
+    standings['classement'] = standings.groupby(keys, sort=False).cumcount() + 1
+    return standings
+
+
+def champ_pos_frame(drivers_standings, drivers_info):
+    '''
+    Returns one row per driver and round with the driver info, the cumulated points and the position,
+    plus a round 0 with no points in the order of the last round, where the animation starts
+    '''
+    # Long points, round by round, in the order of the standings
+    nb_drivers, nb_rounds = drivers_standings.shape
+    df_final = pd.DataFrame({
+        'Abbreviation': np.tile(drivers_standings.index.to_numpy(), nb_rounds),
+        'Points': drivers_standings.to_numpy().ravel(order='F'),
+        'Race': np.repeat(drivers_standings.columns.astype(int).to_numpy(), nb_drivers),
+    })
+    info = drivers_info.drop_duplicates('Abbreviation')[INFO_COLUMNS]
+    df_final = info.merge(df_final, how='right', on='Abbreviation')
+    df_final = rank_rounds(df_final)
+
+    df_init = df_final[df_final['Race'] == df_final['Race'].max()].copy()
+    df_init['Race'] = 0
+    df_init['Points'] = 0
+
+    df_final = pd.concat([df_final, df_init], ignore_index=True)
+    return df_final.sort_values(by=['Race', 'classement'], kind='mergesort')
+
+
+def color_map(drivers_standings, drivers_info):
+    '''
+    Returns the team color of each driver of the standings, white when the team color is unknown
+    '''
+    colors = drivers_info.drop_duplicates('Abbreviation').set_index('Abbreviation')['TeamColor'].reindex(drivers_standings.index)
+    colors = np.where(colors.notna(), '#' + colors.astype(str), '#FFFFFF')
+    return dict(zip(drivers_standings.index, colors))
@@ -0,0 +1,192 @@
+"""
+Long format store of the drivers and constructors standings of every season.
+
+Each row is one driver (or constructor) after one round of one season: the points
+scored in the round, the cumulated points and the position in the championship.
+A new round is appended with the points scored in it; only the totals of the last
+round of that season are needed to update the cumulated points and the positions,
+so the previous rounds are never computed again.
+
+The pages query the store by season and range of rounds. The 2022 standings come
+from the wide CSVs of the local mirror (one column per round), and only the rounds
+missing from the store are appended when the mirror is updated.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_access
+
+
+KINDS = ('drivers', 'constructors')
+COLUMNS = {
+    'kind': 'category',
+    'season': 'int16',
+    'round': 'int16',
+    'name': 'object',
+    'points': 'float32',
+    'total': 'float32',
+    'position': 'int16',
+}
+
+
+class StandingsStore:
+    """
+    Standings of many seasons, one row per competitor and round, updated one round at a time
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._frame = None
+        # Totals after the last round of each (kind, season), in championship order
+        self._last = {}
+        # Reentrant, sync_wide appends rounds while holding it
+        self._lock = threading.RLock()
+
+    def last_round(self, kind, season):
+        '''
+        Returns the last round of a season in the store, 0 when the season is empty
+        '''
+        return self._last.get((kind, int(season)), (0, None))[0]
+
+    def append_round(self, kind, season, gp_round, points, order=None):
+        '''
+        Adds the points scored in one round, a mapping or Series of competitor to points.
+        Competitors who scored before but are missing from `points` keep their total.
+        Competitors level on points keep their previous order, or follow `order` when given
+        (e.g. the official standings, decided on countback)
+        '''
+        if kind not in KINDS:
+            raise ValueError(f"Unknown standings kind {kind!r}, expected one of {KINDS}")
+        season, gp_round = int(season), int(gp_round)
+        points = pd.Series(points, dtype='float64')
+
+        with self._lock:
+            last_round, totals = self._last.get((kind, season), (0, pd.Series(dtype='float64')))
+            if gp_round <= last_round:
+                raise ValueError(f"Round {gp_round} of {season} is already in the {kind} standings (last round {last_round})")
+
+            names = totals.index.append(points.index.difference(totals.index, sort=False))
+            if order is not None:
+                names = pd.Index(order).intersection(names, sort=False).append(names.difference(pd.Index(order), sort=False))
+            round_points = points.reindex(names, fill_value=0)
+            new_totals = totals.reindex(names, fill_value=0) + round_points
+            # Stable sort, the order above decides between competitors level on points
+            ranking = np.argsort(-new_totals.to_numpy(), kind='mergesort')
+            new_totals = new_totals.iloc[ranking]
+
+            chunk = pd.DataFrame({
+                'kind': kind,
+                'season': season,
+                'round': gp_round,
+                'name': new_totals.index,
+                'points': round_points.iloc[ranking].to_numpy(),
+                'total': new_totals.to_numpy(),
+                'position': np.arange(1, len(new_totals) + 1),
+            })
+            self._chunks.append(chunk)
+            self._last[(kind, season)] = (gp_round, new_totals)
+            self._frame = None
+
+    def sync_wide(self, kind, season, wide):
+        '''
+        Appends the rounds of wide cumulated standings (one column per round) missing from the store,
+        returns the rounds appended
+        '''
+        wide = wide.copy()
+        wide.columns = wide.columns.astype(int)
+        appended = []
+        # The store is shared by every session: the rounds missing are read and appended in one step,
+        # so sessions syncing the same new round at once append it only once
+        with self._lock:
+            last_round = self.last_round(kind, season)
+            for gp_round in sorted(c for c in wide.columns if c > last_round):
+                previous = wide[gp_round - 1] if gp_round - 1 in wide.columns else 0
+                self.append_round(kind, season, gp_round, (wide[gp_round] - previous).dropna(), order=wide.index)
+                appended.append(gp_round)
+        return appended
+
+    def frame(self):
+        '''
+        Returns every row of the store
+        '''
+        with self._lock:
+            if self._frame is None:
+                if self._chunks:
+                    # Chunks concatenated once per batch of appends
+                    self._frame = pd.concat(self._chunks, ignore_index=True).astype(COLUMNS)
+                    self._chunks = [self._frame]
+                else:
+                    self._frame = pd.DataFrame({c: pd.Series(dtype=t) for c, t in COLUMNS.items()})
+            return self._frame
+
+    def query(self, kind, season, first_round=None, last_round=None):
+        '''
+        Returns the long standings of a season between two rounds included
+        '''
+        frame = self.frame()
+        mask = (frame['kind'] == kind) & (frame['season'] == int(season))
+        if first_round is not None:
+            mask &= frame['round'] >= int(first_round)
+        if last_round is not None:
+            mask &= frame['round'] <= int(last_round)
+        return frame[mask].reset_index(drop=True)
+
+    def wide(self, kind, season, first_round=None, last_round=None):
+        '''
+        Returns the cumulated points with one column per round, as the standings CSVs,
+        ordered by the position after the last round of the range
+        '''
+        standings = self.query(kind, season, first_round, last_round)
+        if standings.empty:
+            return pd.DataFrame()
+        wide = standings.pivot(index='name', columns='round', values='total')
+        last = standings[standings['round'] == standings['round'].max()].sort_values('position')
+        wide = wide.reindex(last['name'])
+        wide.index.name = None
+        wide.columns = wide.columns.astype(str)
+        wide.columns.name = None
+        # Whole points, as in the CSVs, except for the half points races
+        if np.allclose(wide.fillna(0).to_numpy(), wide.fillna(0).to_numpy().round()):
+            wide = wide.fillna(0).astype(int)
+        return wide
+
+    def save(self, path):
+        frame = self.frame()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + f".{os.getpid()}.tmp"
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Returns a store with the rows of a saved store, ready for the next rounds
+        '''
+        store = cls()
+        frame = pd.read_parquet(path).astype(COLUMNS)
+        store._chunks = [frame]
+        for (kind, season), rows in frame.groupby(['kind', 'season'], observed=True):
+            last = rows[rows['round'] == rows['round'].max()].sort_values('position')
+            store._last[(kind, int(season))] = (int(last['round'].iloc[0]), pd.Series(last['total'].to_numpy(dtype='float64'), index=last['name'].to_numpy()))
+        return store
+
+
+# The store shared by every page, fed by the standings CSVs of the local mirror
+store = StandingsStore()
+STANDINGS_FILES = {
+    2022: {'drivers': 'drivers_standings.csv', 'constructors': 'constructors_standings.csv'},
+}
+
+
+def get_store(season=2022):
+    '''
+    Returns the shared store, after appending the rounds of `season` added to the mirror since the last call
+    '''
+    for kind, name in STANDINGS_FILES.get(season, {}).items():
+        appended = store.sync_wide(kind, season, data_access.read_csv(name, index_col=0))
+        if appended:
+            print(f"{kind.capitalize()} standings of {season}: rounds {appended} appended")
+    return store